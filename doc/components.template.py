@@ -20,6 +20,14 @@ class Operator1(BaseOperator):
         # Run the operator and return a new solution.
         pass
 
+    def run_inplace(self, solution: Solution) -> object:
+        # Optional. Run the operator on the solution itself and return the undo token. Default runs run and replaces the solution content.
+        pass
+
+    def undo(self, solution: Solution, undo_token: object) -> None:
+        # Optional. Revert run_inplace with its undo token.
+        pass
+
 
 class Operator2(BaseOperator):
     def __init__(self, **kwargs):
@@ -46,6 +54,10 @@ class Operator2(BaseOperator):
 #     def run(self, solution: Solution) -> Solution:
 #         new_tour = solution.tour + [self.node]
 #         return Solution(new_tour)
+#     def run_inplace(self, solution: Solution) -> None:
+#         solution.tour.append(self.node)
+#     def undo(self, solution: Solution, undo_token: None) -> None:
+#         solution.tour.pop()
 
 
 # class SwapOperator(BaseOperator):
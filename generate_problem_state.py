@@ -10,6 +10,7 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description="Generate problem state")
     parser.add_argument("-p", "--problem", choices=problem_pool, required=True, help="Specifies the type of combinatorial optimization problem.")
     parser.add_argument("-m", "--smoke_test", action='store_true', help="Optional flag to conduct a preliminary smoke test.")
+    parser.add_argument("-i", "--incremental", action='store_true', help="Optional flag to also generate update_solution_problem_state for incremental solution problem state.")
     parser.add_argument("-l", "--llm_config_file", type=str, default=os.path.join("output", "llm_config", "azure_gpt_4o.json"), help="Path to the language model configuration file. Default is azure_gpt_4o.json.")
 
     return parser.parse_args()
@@ -18,6 +19,7 @@ def main():
     args = parse_arguments()
     problem = args.problem
     smoke_test = args.smoke_test
+    incremental = args.incremental
     llm_config_file = args.llm_config_file
 
     prompt_dir=os.path.join("src", "problems", "base", "prompt")
@@ -25,7 +27,7 @@ def main():
     llm_client = get_llm_client(llm_config_file, prompt_dir, output_dir)
 
     problem_state_generator = ProblemStateGenerator(llm_client=llm_client, problem=problem)
-    problem_state_generator.generate_problem_state(smoke_test=smoke_test)
+    problem_state_generator.generate_problem_state(smoke_test=smoke_test, incremental=incremental)
 
 if __name__ == "__main__":
     main()
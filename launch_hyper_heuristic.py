@@ -16,11 +16,22 @@ def parse_arguments():
     parser.add_argument("-e", "--heuristic", type=str, required=True, help=": Specifies which heuristic function or strategy to apply. 'heuristic_function_name': Directly specify a heuristic function. 'llm_hh': Utilizes LLM for rapid heuristic selection from the directory. 'random_hh': Randomly selects a heuristic from the directory. 'or_solver': Uses an exact OR solver, where applicable.")
     parser.add_argument("-l", "--llm_config_file", type=str, default=os.path.join("output", "llm_config", "azure_gpt_4o.json"), help="Path to the language model configuration file. Default is azure_gpt_4o.json.")
     parser.add_argument("-d", "--heuristic_dir", type=str, default="basic_heuristics", help="Directory containing heuristics for llm_hh or random_hh. Default is 'basic_heuristics'.")
-    parser.add_argument("-t", "--test_data", type=str, default="test_data", help="test_data", help="Path to a specific test data file. Defaults to testing all files in the `test_data` directory if not specified.")
+    parser.add_argument("-t", "--test_data", type=str, default="test_data", help="Path to a specific test data file. Defaults to testing all files in the `test_data` directory if not specified.")
     parser.add_argument("-n", "--iterations_scale_factor", type=float, default=2.0, help="Scale factor determining total heuristic steps relative to problem size. Default is 2.0.")
     parser.add_argument("-m", "--steps_per_selection", type=int, default=5, help="Number of steps executed per heuristic selection in LLM mode. Default is 5.")
     parser.add_argument("-c", "--num_candidate_heuristics", type=int, default=1, help="Number of candidate heuristics considered in LLM mode. 1 represents select by LLM without TTS. Default is 1.")
     parser.add_argument("-b", "--rollout_budget", type=int, default=0, help="Number of Monte-Carlo evaluations per heuristic in LLM mode. 0 represents select by LLM without TTS. Default is 0.")
+    parser.add_argument("--racing", action="store_true", help="Race the candidate heuristics in LLM mode, which drops dominated candidates early instead of running the full rollout budget for each.")
+    parser.add_argument("--rollout_horizon", type=int, default=None, help="Truncate each TTS rollout in LLM mode after this number of random heuristic steps and score the partial solution by --rollout_completion or the estimate of the problem. Default is full rollouts.")
+    parser.add_argument("--rollout_completion", type=str, default=None, help="Heuristic that completes truncated rollouts greedily. Default is the estimate of the problem, or the full rollout for problems without estimate.")
+    parser.add_argument("--surrogate", action="store_true", help="Learn the TTS rollout outcomes online in LLM mode and skip the rollouts of candidates that the surrogate predicts worse with confidence.")
+    parser.add_argument("--time_limit", type=float, default=None, help="Wall-clock seconds per instance. The run stops once it is reached and returns the best solution so far. Default is no limit.")
+    parser.add_argument("--max_steps", type=int, default=None, help="Maximum number of heuristic runs per instance, on top of the steps from iterations_scale_factor. Default is no limit.")
+    parser.add_argument("--stagnation_steps", type=int, default=None, help="Stop after this number of heuristic runs without improving the best complete solution. Default is no limit.")
+    parser.add_argument("--record_mode", type=str, default="full", choices=["full", "sample", "improvement"], help="Operations to record in the trajectory: every one, every record_sample_interval ones, or the ones that improve the key value. Default is 'full'.")
+    parser.add_argument("--record_sample_interval", type=int, default=1, help="Record every this number of operations in sample mode. Default is 1.")
+    parser.add_argument("--max_records", type=int, default=None, help="Maximum number of recorded operations. The trajectory is downsampled beyond it. Default is no limit.")
+    parser.add_argument("--profile", action="store_true", help="Profile the time and allocations of each heuristic and save them in profile.txt next to result.txt.")
     parser.add_argument("-r", "--result_dir", type=str, default="result", help="Target directory for saving results. Default is 'result'.")
 
     return parser.parse_args()
@@ -36,11 +47,22 @@ def main():
     steps_per_selection = args.steps_per_selection
     num_candidate_heuristics = args.num_candidate_heuristics
     rollout_budget = args.rollout_budget
+    racing = args.racing
+    rollout_horizon = args.rollout_horizon
+    rollout_completion = args.rollout_completion
+    surrogate = args.surrogate
     result_dir = args.result_dir
+    time_limit = args.time_limit
+    max_steps = args.max_steps
+    stagnation_steps = args.stagnation_steps
+    record_mode = args.record_mode
+    record_sample_interval = args.record_sample_interval
+    max_records = args.max_records
+    profile = args.profile
 
     datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
     heuristic = heuristic.split(os.sep)[-1].split(".")[0]
-    heuristic_pool = os.listdir(os.path.join("src", "problems", problem, "heuristics", heuristic_dir))
+    heuristic_pool = [heuristic_file for heuristic_file in os.listdir(os.path.join("src", "problems", problem, "heuristics", heuristic_dir)) if heuristic_file.endswith(".py")]
 
     base_output_dir = os.path.join(os.getenv("AMLT_OUTPUT_DIR"), "..", "..", "output") if os.getenv("AMLT_OUTPUT_DIR") else "output"
 
@@ -48,7 +70,7 @@ def main():
         prompt_dir = os.path.join("src", "problems", "base", "prompt")
         llm_client = get_llm_client(llm_config_file, prompt_dir, None)
         llm_name = llm_config_file.split(os.sep)[-1].split(".")[0]
-        experiment_name = f"{heuristic}.{heuristic_dir}.{llm_name}.n{iterations_scale_factor}m{steps_per_selection}c{num_candidate_heuristics}b{rollout_budget}.{datetime_str}"
+        experiment_name = f"{heuristic}.{heuristic_dir}.{llm_name}.n{iterations_scale_factor}m{steps_per_selection}c{num_candidate_heuristics}b{rollout_budget}{'.racing' if racing else ''}{f'.h{rollout_horizon}' if rollout_horizon is not None else ''}{'.surrogate' if surrogate else ''}.{datetime_str}"
         hyper_heuristic = LLMSelectionHyperHeuristic(
             llm_client=llm_client,
             heuristic_pool=heuristic_pool,
@@ -57,6 +79,10 @@ def main():
             steps_per_selection=steps_per_selection,
             num_candidate_heuristics=num_candidate_heuristics,
             rollout_budget=rollout_budget,
+            racing=racing,
+            rollout_horizon=rollout_horizon,
+            rollout_completion_heuristic=rollout_completion,
+            use_surrogate=surrogate,
         )
     elif heuristic == "random_hh":
         experiment_name = f"{heuristic}.{heuristic_dir}.{datetime_str}"
@@ -80,7 +106,13 @@ def main():
 
     for data_name in test_data:
         env = Env(data_name=data_name)
+        if time_limit is not None or max_steps is not None or stagnation_steps is not None:
+            env.set_budget(time_limit=time_limit, max_steps=max_steps, stagnation_steps=stagnation_steps)
+        if record_mode != "full" or max_records is not None:
+            env.set_recording(mode=record_mode, sample_interval=record_sample_interval, max_records=max_records)
         output_dir = os.path.join(base_output_dir, problem, result_dir, env.data_ref_name, experiment_name)
+        if profile:
+            env.set_profiler()
         env.reset(output_dir)
 
         paras = '\n'.join(f'{key}={value}' for key, value in vars(args).items()) 
@@ -90,9 +122,18 @@ def main():
 
         if heuristic == "llm_hh":
             llm_client.reset(env.output_dir)
-        validation_result = hyper_heuristic.run(env)
+        try:
+            validation_result = hyper_heuristic.run(env)
+        except KeyboardInterrupt:
+            print("Interrupted", heuristic, data_name)
+            validation_result = False
+        # Anytime run returns the best solution within the budget, which may be better than the last one.
+        if env.restore_best_solution():
+            validation_result = env.is_complete_solution and env.is_valid_solution
+        if profile:
+            env.dump_profile()
         if validation_result:
-            env.dump_result()
+            env.dump_result(content_dict=env.budget.summarize() if env.budget else {})
             print(os.path.join(env.output_dir, "result.txt"), heuristic, data_name, env.key_item, env.key_value)
         else:
             print("Invalid solution", heuristic, data_name)
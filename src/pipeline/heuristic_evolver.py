@@ -22,7 +22,6 @@ class HeuristicEvolver:
         self.problem = problem
         self.evolution_cases = [os.path.join(evolution_dir, f) for f in os.listdir(evolution_dir)]
         self.validation_cases = [os.path.join(validation_dir, f) for f in os.listdir(validation_dir)]
-        self.get_instance_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_instance_problem_state")
         self.get_solution_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_solution_problem_state")
 
         # Load env
@@ -41,9 +40,8 @@ class HeuristicEvolver:
         # Ready for validation feature
         instance_problem_states = []
         for data in self.validation_cases:
-            global_data = Env(data_name=data).instance_data
             instance_problem_state = {"data_name": data.split(os.sep)[-1]}
-            instance_problem_state.update(self.get_instance_problem_state(global_data))
+            instance_problem_state.update(Env(data_name=data).instance_problem_state)
             instance_problem_states.append(instance_problem_state)
         self.instance_problem_states_df = pd.DataFrame(instance_problem_states)
 
@@ -211,8 +209,10 @@ class HeuristicEvolver:
 
         # Generate positive result by perturbation heuristic
         positive_result = None
+        env.reset(output_dir)
+        initial_snapshot = env.snapshot()
         for _ in range(perturbation_time):
-            env.reset(output_dir)
+            env.restore(initial_snapshot)
             hyper_heuristic = PerturbationHyperHeuristic(basic_heuristic_file, perturbation_heuristic_file, self.problem, perturbation_ratio)
             hyper_heuristic.run(env)
             if env.compare(env.key_value, negative_value) > 0:
@@ -241,7 +241,7 @@ class HeuristicEvolver:
 
         # Load data
         prompt_dict["instance_data"] = filter_dict_to_str(env.instance_data)
-        prompt_dict["instance_problem_state"] = filter_dict_to_str(self.get_instance_problem_state(env.instance_data))
+        prompt_dict["instance_problem_state"] = filter_dict_to_str(env.instance_problem_state)
 
         # Load solution
         positive_result = parse_text_to_dict(positive_result)
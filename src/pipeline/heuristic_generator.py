@@ -4,6 +4,7 @@ import importlib
 import traceback
 from copy import deepcopy
 from src.problems.base.components import BaseOperator
+from src.util.file_index import refresh_file_indexes
 from src.util.util import extract, extract_function_with_short_docstring, filter_dict_to_str, find_key_value, load_function, parse_paper_to_dict, replace_strings_in_dict, sanitize_function_name, load_framework_description, search_file
 from src.util.llm_client.base_llm_client import BaseLLMClient
 
@@ -231,6 +232,7 @@ class HeuristicGenerator:
         print(f"Save {function_name} code to {output_heuristic_file}")
         with open(output_heuristic_file, "w") as fp:
             fp.write(code)
+        refresh_file_indexes(output_heuristic_file)
         return output_heuristic_file
 
     def smoke_test(self, heuristic_code: str, function_name: str, max_try_times: int=5) -> str:
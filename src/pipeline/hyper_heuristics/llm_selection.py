@@ -1,8 +1,11 @@
 import traceback
+from concurrent.futures.process import BrokenProcessPool
 from src.problems.base.env import BaseEnv
+from src.problems.base.result_writer import ResultWriter
 from src.util.util import find_closest_match, load_function, extract_function_with_short_docstring, extract, filter_dict_to_str, search_file
 from src.util.llm_client.base_llm_client import BaseLLMClient
-from src.util.tts_bon import tts_bon
+from src.util.tts_bon import tts_bon, RolloutPool
+from src.util.rollout_surrogate import RolloutSurrogate
 
 
 class LLMSelectionHyperHeuristic:
@@ -16,6 +19,10 @@ class LLMSelectionHyperHeuristic:
         num_candidate_heuristics: int=3,
         rollout_budget: int=10,
         problem_state_content_threshold: int=1000,
+        racing: bool=False,
+        rollout_horizon: int=None,
+        rollout_completion_heuristic: str=None,
+        use_surrogate: bool=False,
     ) -> None:
         self.llm_client = llm_client
         self.problem = problem
@@ -25,6 +32,13 @@ class LLMSelectionHyperHeuristic:
         self.num_candidate_heuristics = num_candidate_heuristics
         self.rollout_budget = rollout_budget
         self.problem_state_content_threshold = problem_state_content_threshold
+        # Race the candidates in TTS, dropping dominated ones early instead of running rollout_budget rollouts for each.
+        self.racing = racing
+        # Truncate TTS rollouts after rollout_horizon steps and score them by the completion heuristic or the estimate of env.
+        self.rollout_horizon = rollout_horizon
+        self.rollout_completion_heuristic = None if rollout_completion_heuristic is None else rollout_completion_heuristic.split(".")[0]
+        # Learn the rollout outcomes online and skip the rollouts of candidates that are predicted worse with confidence.
+        self.use_surrogate = use_surrogate
 
         self.heuristic_docs = {
             heuristic: extract_function_with_short_docstring(open(search_file(heuristic + ".py", problem)).read(), heuristic) 
@@ -32,29 +46,42 @@ class LLMSelectionHyperHeuristic:
         self.heuristic_functions = {
             heuristic.split(".")[0]: load_function(heuristic, problem=self.problem)
             for heuristic in self.heuristic_pool}
-        self.get_instance_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_instance_problem_state")
         self.get_solution_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_solution_problem_state")
         self.get_observation_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_observation_problem_state")
 
     def run(self, env:BaseEnv) -> bool:
         max_steps = int(env.construction_steps * self.iterations_scale_factor)
-        selection_round = 0
-        hidden_heuristics = []
-        heuristic_traject = []
 
         # Load background
         prompt_dict = self.llm_client.load_background(self.problem, background_file="background_without_code.txt")
 
         # Generate global heuristic value
         instance_data = env.instance_data
-        instance_problem_state = self.get_instance_problem_state(instance_data)
+        instance_problem_state = env.instance_problem_state
         prompt_dict["instance_problem_state"] = filter_dict_to_str([instance_data, instance_problem_state], self.problem_state_content_threshold)
 
         next_solution_problem_state = self.get_solution_problem_state(instance_data, env.current_solution)
+        # Append the trajectory and keep the best solution during the run instead of rewriting the full result every round
+        result_writer = ResultWriter(env, dump_records=["operation_id", "step", "operator", "heuristic"]) if env.output_dir else None
+        # Workers of the pool load the instance and heuristics once and serve the TTS selection of every round.
+        rollout_pool = RolloutPool(env, self.heuristic_pool, self.problem) if self.rollout_budget > 0 and self.num_candidate_heuristics > 1 else None
+        # The surrogate learns the rollouts of this instance only, as key values of different instances are not comparable.
+        surrogate = RolloutSurrogate() if self.use_surrogate and rollout_pool else None
+        try:
+            return self.run_selection_rounds(env, max_steps, prompt_dict, next_solution_problem_state, result_writer, rollout_pool, surrogate)
+        finally:
+            if rollout_pool:
+                rollout_pool.shutdown()
+
+    def run_selection_rounds(self, env: BaseEnv, max_steps: int, prompt_dict: dict, next_solution_problem_state: dict, result_writer: ResultWriter, rollout_pool: RolloutPool, surrogate: RolloutSurrogate=None) -> bool:
+        selection_round = 0
+        hidden_heuristics = []
+        heuristic_traject = []
+        instance_data = env.instance_data
         while selection_round * self.steps_per_selection <= max_steps and env.continue_run:
             try:
-                if env.is_complete_solution:
-                    env.dump_result()
+                if result_writer:
+                    result_writer.update()
                 self.llm_client.load_chat("background")
 
                 # Load heuristic pool
@@ -92,20 +119,38 @@ class LLMSelectionHyperHeuristic:
                         matched_candidate_heuristics.append(matched_candidate_heuristic)
                 assert len(matched_candidate_heuristics) > 0
                 
-                # TTS selection
-                selected_heuristic_name = tts_bon(
-                    env,
-                    matched_candidate_heuristics,
-                    self.heuristic_pool,
-                    self.problem,
-                    self.iterations_scale_factor,
-                    self.steps_per_selection,
-                    self.rollout_budget,
-                )
-                # Record selection and observation
+                # Observation before the selection, which is also the input of the surrogate in TTS
                 pre_observation = self.get_observation_problem_state(solution_problem_state)
                 pre_observation[env.key_item] = env.key_value
+
+                # TTS selection
+                try:
+                    selected_heuristic_name = tts_bon(
+                        env,
+                        matched_candidate_heuristics,
+                        self.heuristic_pool,
+                        self.problem,
+                        self.iterations_scale_factor,
+                        self.steps_per_selection,
+                        self.rollout_budget,
+                        rollout_pool,
+                        self.racing,
+                        rollout_horizon=self.rollout_horizon,
+                        completion_heuristic=self.rollout_completion_heuristic,
+                        surrogate=surrogate,
+                        observation=pre_observation,
+                        deadline=env.budget.deadline if env.budget else None,
+                    )
+                except BrokenProcessPool:
+                    # A crashed worker breaks the whole pool, so start new workers for the next rounds and take the first candidate of this round.
+                    print(traceback.format_exc())
+                    if rollout_pool:
+                        rollout_pool.restart()
+                    selected_heuristic_name = matched_candidate_heuristics[0]
+                # Record selection and observation
                 for _ in range(self.steps_per_selection):
+                    if not env.continue_run:
+                        break
                     env.run_heuristic(self.heuristic_functions[selected_heuristic_name], add_record_item={"step": selection_round})
                 next_solution_problem_state = self.get_solution_problem_state(instance_data, env.current_solution)
                 next_observation = self.get_observation_problem_state(next_solution_problem_state)
@@ -121,4 +166,6 @@ class LLMSelectionHyperHeuristic:
             except Exception as e:
                 trace_string = traceback.format_exc()
                 print(trace_string)
+        if result_writer:
+            result_writer.update()
         return env.is_complete_solution and env.is_valid_solution
@@ -7,18 +7,24 @@ from src.util.util import load_function
 class RandomHyperHeuristic:
     def __init__(
         self,
-        heuristic_pool: list[str],
+        heuristic_pool: list,
         problem: str,
         iterations_scale_factor: float=2.0,
+        seed: int=None,
     ) -> None:
-        self.heuristic_pools = [load_function(heuristic, problem=problem) for heuristic in heuristic_pool]
+        # Heuristics can be given as names to load or as loaded functions, such as the ones compiled once in rollout workers.
+        self.heuristic_pools = [heuristic if callable(heuristic) else load_function(heuristic, problem=problem) for heuristic in heuristic_pool]
         self.iterations_scale_factor = iterations_scale_factor
+        # A seeded generator gives the same heuristic sequence on every run, independent of random numbers drawn by the heuristics.
+        self.random = random if seed is None else random.Random(seed)
 
-    def run(self, env:BaseEnv) -> bool:
-        max_steps = int(env.construction_steps * self.iterations_scale_factor)
+    def run(self, env:BaseEnv, max_steps: int=None) -> bool:
+        # max_steps overrides the steps from iterations_scale_factor, such as the horizon of truncated rollouts.
+        if max_steps is None:
+            max_steps = int(env.construction_steps * self.iterations_scale_factor)
         current_steps = 0
         while current_steps <= max_steps and env.continue_run:
-            heuristic = random.choice(self.heuristic_pools)
+            heuristic = self.random.choice(self.heuristic_pools)
             _ = env.run_heuristic(heuristic)
             current_steps += 1
         return env.is_complete_solution and env.is_valid_solution
@@ -19,10 +19,10 @@ class SingleConstructiveSingleImproveHyperHeuristic:
     def run(self, env:BaseEnv) -> bool:
         max_steps = int(env.construction_steps * self.iterations_scale_factor)
         heuristic_work = BaseOperator()
-        while isinstance(heuristic_work, BaseOperator):
+        while isinstance(heuristic_work, BaseOperator) and env.continue_run:
             heuristic_work = env.run_heuristic(self.constructive_heuristic)
         for _ in range(max_steps - env.construction_steps):
             heuristic_work = env.run_heuristic(self.improve_heuristic)
-            if not heuristic_work:
+            if not heuristic_work or not env.continue_run:
                 break
         return env.is_complete_solution and env.is_valid_solution
\ No newline at end of file
@@ -1,7 +1,10 @@
 import os
+import copy
 import yaml
 import importlib
 import traceback
+import numpy as np
+from src.util.file_index import refresh_file_indexes
 from src.util.util import extract, load_function, parse_text_to_dict, search_file
 from src.util.llm_client.base_llm_client import BaseLLMClient
 
@@ -17,7 +20,7 @@ class ProblemStateGenerator:
         self.output_dir = self.llm_client.output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def generate_problem_state(self, smoke_test: bool=False, max_try_times: int=5) -> str:
+    def generate_problem_state(self, smoke_test: bool=False, max_try_times: int=5, incremental: bool=False) -> str:
         prompt_dict = self.llm_client.load_background(self.problem, "background_without_code")
         problem_state_description_file = search_file("problem_state_description.txt", problem=self.problem)
         assert problem_state_description_file is not None, f"Problem state description file {problem_state_description_file} does not exist"
@@ -54,6 +57,15 @@ class ProblemStateGenerator:
         solution_problem_state_code = f"from src.problems.{self.problem}.components import Solution\n" + solution_problem_state_code
         self.llm_client.dump(f"solution_problem_state")
 
+        # Generate incremental solution problem state code
+        update_solution_problem_state_code = None
+        if incremental:
+            prompt_dict["solution_problem_state_code"] = solution_problem_state_code
+            self.llm_client.load("implement_update_solution_problem_state_code", prompt_dict)
+            response = self.llm_client.chat()
+            update_solution_problem_state_code = extract(response, "python_code")
+            self.llm_client.dump(f"update_solution_problem_state")
+
         # Get observation problem state
         self.llm_client.load("generate_observation_problem_state", prompt_dict)
         response = self.llm_client.chat()
@@ -89,12 +101,30 @@ class ProblemStateGenerator:
                 if instance_error_message or solution_error_message or observation_error_message:
                     self.llm_client.dump(f"problem_state_abandoned")
                     return None
+            if update_solution_problem_state_code:
+                update_error_message = None
+                for _ in range(max_try_times):
+                    update_error_message = self.smoke_test_update(solution_problem_state_code, update_solution_problem_state_code)
+                    if not update_error_message:
+                        break
+                    self.llm_client.load(update_error_message)
+                    response = self.llm_client.chat()
+                    update_solution_problem_state_code = extract(response, "python_code")
+                    self.llm_client.dump(f"update_solution_problem_state_revision")
+                if update_error_message:
+                    # The full version still works, so only the incremental version is abandoned.
+                    self.llm_client.dump(f"update_solution_problem_state_abandoned")
+                    update_solution_problem_state_code = None
         # Save problem state code
         problem_state_code_file = os.path.join(self.output_dir, "problem_state.py")
         node = f"# This file is generated by generate_problem_state.py.\n\nfrom src.problems.{self.problem}.components import Solution\n"
-        problem_state_code = "\n\n".join([node, instance_problem_state_code, solution_problem_state_code, observation_problem_state_code])
+        problem_state_codes = [node, instance_problem_state_code, solution_problem_state_code, observation_problem_state_code]
+        if update_solution_problem_state_code:
+            problem_state_codes.append(f"from src.problems.{self.problem}.components import *\n" + update_solution_problem_state_code)
+        problem_state_code = "\n\n".join(problem_state_codes)
         with open(problem_state_code_file, "w") as fp:
             fp.write(problem_state_code)
+        refresh_file_indexes(problem_state_code_file)
         print(f"Save problem state in {problem_state_code_file}")
 
         # Save problem state description
@@ -115,7 +145,7 @@ class ProblemStateGenerator:
         return description
 
 
-    def smoke_test(self, instance_problem_state_code: str, solution_problem_state_code: str, observation_problem_state_code: str) -> str:
+    def load_smoke_env(self) -> tuple:
         # Load smoke data
         smoke_data_dir = search_file("smoke_data", problem=self.problem)
         previous_operations = []
@@ -136,6 +166,10 @@ class ProblemStateGenerator:
             globals()[name] = getattr(module, name)
         env = Env(data_name=smoke_data)
         env.reset()
+        return env, previous_operations
+
+    def smoke_test(self, instance_problem_state_code: str, solution_problem_state_code: str, observation_problem_state_code: str) -> str:
+        env, previous_operations = self.load_smoke_env()
         for previous_operation in previous_operations:
             env.run_operator(eval(previous_operation.strip()))
         try:
@@ -162,4 +196,35 @@ class ProblemStateGenerator:
         except Exception as e:
             error_message = traceback.format_exc()
             return None, None, f"We got error when run get_observation_problem_state:\n{error_message}. Please fix up the get_observation_problem_state function in same format."
-        return None, None, None
\ No newline at end of file
+        return None, None, None
+
+    def smoke_test_update(self, solution_problem_state_code: str, update_solution_problem_state_code: str) -> str:
+        # Replay the smoke operations and compare the incremental state with the full state after each of them.
+        env, previous_operations = self.load_smoke_env()
+        try:
+            get_solution_problem_state = load_function(solution_problem_state_code, function_name="get_solution_problem_state")
+            update_solution_problem_state = load_function(f"from src.problems.{self.problem}.components import *\n" + update_solution_problem_state_code, function_name="update_solution_problem_state")
+            for previous_operation in previous_operations:
+                operator = eval(previous_operation.strip())
+                prev_state = get_solution_problem_state(env.instance_data, env.current_solution)
+                env.run_operator(operator)
+                updated_state = update_solution_problem_state(env.instance_data, copy.deepcopy(prev_state), operator, env.current_solution)
+                if updated_state is None:
+                    continue
+                full_state = get_solution_problem_state(env.instance_data, env.current_solution)
+                mismatched_keys = [key for key in full_state if key not in updated_state or not self.is_same_value(full_state[key], updated_state[key])]
+                if mismatched_keys:
+                    mismatch_str = "\n".join([f"{key}: expected {full_state[key]}, got {updated_state.get(key)}" for key in mismatched_keys])
+                    return f"After running {operator}, update_solution_problem_state returns different problem states from get_solution_problem_state:\n{mismatch_str}\nPlease fix up the update_solution_problem_state function in same format."
+        except Exception as e:
+            error_message = traceback.format_exc()
+            return f"We got error when run update_solution_problem_state:\n{error_message}. Please fix up the update_solution_problem_state function in same format."
+        return None
+
+    def is_same_value(self, expected: object, actual: object) -> bool:
+        try:
+            if isinstance(expected, (int, float, np.number, np.ndarray)):
+                return bool(np.allclose(expected, actual, equal_nan=True))
+            return bool(expected == actual)
+        except Exception:
+            return False
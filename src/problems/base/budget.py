@@ -0,0 +1,72 @@
+import copy
+import time
+from src.problems.base.components import BaseSolution
+
+
+class Budget:
+    """Run budget that env checks in continue_run, and the best solution found so far within it.
+
+    Limits:
+        - time_limit: Wall-clock seconds since the budget starts at env reset.
+        - max_steps: Number of heuristic runs.
+        - stagnation_steps: Number of heuristic runs without improving the best complete solution.
+    Limits that are None are not checked. The best complete solution is kept, so an anytime run can stop at any moment and still return it.
+    Budgets that only bound a run, such as the deadline of rollouts, set keep_best_solution False to skip copying the best solution.
+    """
+    def __init__(self, time_limit: float=None, max_steps: int=None, stagnation_steps: int=None, keep_best_solution: bool=True):
+        self.time_limit = time_limit
+        self.max_steps = max_steps
+        self.stagnation_steps = stagnation_steps
+        self.keep_best_solution = keep_best_solution
+        self.start()
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self.steps = 0
+        self.last_improvement_step = 0
+        self.best_solution: BaseSolution = None
+        self.best_key_value: float = None
+
+    @property
+    def elapsed_time(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    @property
+    def deadline(self) -> float:
+        """Wall-clock time.time() at which the time limit is reached, which other processes can compare with, or None without time limit."""
+        if self.time_limit is None:
+            return None
+        return time.time() + self.time_limit - self.elapsed_time
+
+    @property
+    def is_exhausted(self) -> bool:
+        if self.time_limit is not None and self.elapsed_time >= self.time_limit:
+            return True
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            return True
+        # Stagnation is counted only after the first complete solution, so construction is not cut short.
+        if self.stagnation_steps is not None and self.best_solution is not None and self.steps - self.last_improvement_step >= self.stagnation_steps:
+            return True
+        return False
+
+    def step(self, env) -> bool:
+        """Count one heuristic run and keep the current solution of env if it is the best complete one. Return whether the best is updated."""
+        self.steps += 1
+        if not self.keep_best_solution or not env.is_complete_solution:
+            return False
+        key_value = env.key_value
+        if key_value is None or (self.best_key_value is not None and env.compare(key_value, self.best_key_value) <= 0):
+            return False
+        memo = {id(value): value for value in env.instance_data.values()}
+        self.best_solution = copy.deepcopy(env.current_solution, memo)
+        self.best_key_value = key_value
+        self.last_improvement_step = self.steps
+        return True
+
+    def summarize(self) -> dict:
+        return {
+            "elapsed_time": round(self.elapsed_time, 3),
+            "steps": self.steps,
+            "best_step": self.last_improvement_step if self.best_solution is not None else None,
+            "best_key_value": self.best_key_value,
+        }
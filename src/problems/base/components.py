@@ -3,6 +3,11 @@ class BaseSolution:
     def __init__(self, **kwargs):
         pass
 
+    def canonical_hash(self) -> int:
+        """Hash of the solution content, which is the same for solutions that are equal as solutions, such as sets with different insertion orders.
+        Problems override it with a hash of their solution items, which is cheaper than the string."""
+        return hash(str(self))
+
     def __str__(self) -> str:
         pass
 
@@ -15,6 +20,18 @@ class BaseOperator:
     def run(self, solution: BaseSolution) -> BaseSolution:
         pass
 
+    def run_inplace(self, solution: BaseSolution) -> object:
+        """Apply the operator on the solution itself and return the undo token for undo.
+        The default runs the copying run and moves the new content into the solution, so operators override it when they can modify the solution directly."""
+        new_solution = self.run(solution)
+        undo_token = solution.__dict__
+        solution.__dict__ = new_solution.__dict__
+        return undo_token
+
+    def undo(self, solution: BaseSolution, undo_token: object) -> None:
+        """Revert run_inplace on the solution with the undo token it returned."""
+        solution.__dict__ = undo_token
+
     def __str__(self) -> str:
         params = ', '.join(f"{key}={value}" for key, value in self.__dict__.items())
         return f"{self.__class__.__name__}({params})"
\ No newline at end of file
@@ -0,0 +1,244 @@
+import numpy as np
+import networkx as nx
+
+# Edge weight types that are computed from node coordinates, following the TSPLIB conventions.
+coordinate_edge_weight_types = ["EUC_2D", "EUC_3D", "CEIL_2D", "MAN_2D", "MAN_3D", "MAX_2D", "MAX_3D", "GEO", "ATT"]
+
+
+def nint(values: np.ndarray) -> np.ndarray:
+    """Round to the nearest integer as TSPLIB does, which is int(x + 0.5) for non-negative distances."""
+    return np.floor(values + 0.5)
+
+
+def geo_radians(coordinates: np.ndarray) -> np.ndarray:
+    """Convert TSPLIB GEO coordinates in DDD.MM format to radians."""
+    degrees = np.trunc(coordinates)
+    minutes = coordinates - degrees
+    return np.radians(degrees + minutes * 5 / 3)
+
+
+def pairwise_distance(sources: np.ndarray, targets: np.ndarray, edge_weight_type: str="EUC_2D", rounding: bool=True) -> np.ndarray:
+    """Compute the distances from each source to each target coordinate by broadcasting.
+
+    Args:
+        sources (np.ndarray): Source coordinates with shape (source_num, dimension).
+        targets (np.ndarray): Target coordinates with shape (target_num, dimension).
+        edge_weight_type (str): TSPLIB edge weight type in coordinate_edge_weight_types.
+        rounding (bool): Whether to round the distances by the TSPLIB convention of edge weight type. GEO and ATT are always rounded.
+
+    Returns:
+        np.ndarray: The float distance matrix with shape (source_num, target_num).
+    """
+    assert edge_weight_type in coordinate_edge_weight_types, f"Edge weight type {edge_weight_type} is not in {coordinate_edge_weight_types}"
+    sources = np.asarray(sources, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    if edge_weight_type == "GEO":
+        sources, targets = geo_radians(sources), geo_radians(targets)
+        q1 = np.cos(sources[:, None, 1] - targets[None, :, 1])
+        q2 = np.cos(sources[:, None, 0] - targets[None, :, 0])
+        q3 = np.cos(sources[:, None, 0] + targets[None, :, 0])
+        # Clip the float error out of the domain of arccos.
+        distances = 6378.388 * np.arccos(np.clip(0.5 * ((1 + q1) * q2 - (1 - q1) * q3), -1, 1)) + 1
+        return np.trunc(distances)
+
+    # Accumulate one coordinate dimension at a time with in-place operations to keep one temporary matrix.
+    distances = np.zeros((len(sources), len(targets)))
+    for dimension in range(sources.shape[1]):
+        deltas = np.subtract.outer(sources[:, dimension], targets[:, dimension])
+        if edge_weight_type.startswith("MAN"):
+            distances += np.abs(deltas, out=deltas)
+        elif edge_weight_type.startswith("MAX"):
+            np.maximum(distances, np.abs(deltas, out=deltas), out=distances)
+        else:
+            distances += np.multiply(deltas, deltas, out=deltas)
+    if edge_weight_type in ["MAN_2D", "MAN_3D", "MAX_2D", "MAX_3D"]:
+        return nint(distances) if rounding else distances
+
+    if edge_weight_type == "ATT":
+        distances = np.sqrt(distances / 10, out=distances)
+        rounded_distances = nint(distances)
+        return rounded_distances + (rounded_distances < distances)
+    np.sqrt(distances, out=distances)
+    if not rounding:
+        return distances
+    if edge_weight_type == "CEIL_2D":
+        return np.ceil(distances, out=distances)
+    distances += 0.5
+    return np.floor(distances, out=distances)
+
+
+def compute_distance_matrix(coordinates: np.ndarray, edge_weight_type: str="EUC_2D", rounding: bool=True, block_size: int=256) -> np.ndarray:
+    """Compute the full distance matrix of coordinates in row blocks, so the temporary memory is block_size * node_num per coordinate dimension.
+    Distance from a node to itself is 0."""
+    coordinates = np.asarray(coordinates, dtype=float)
+    node_num = len(coordinates)
+    distance_matrix = np.empty((node_num, node_num))
+    for start in range(0, node_num, block_size):
+        end = min(start + block_size, node_num)
+        distance_matrix[start: end] = pairwise_distance(coordinates[start: end], coordinates, edge_weight_type, rounding)
+    np.fill_diagonal(distance_matrix, 0)
+    return distance_matrix
+
+
+def load_tsplib_distance_matrix(problem: object, rounding: bool=True) -> np.ndarray:
+    """Get the distance matrix of the tsplib95 problem, in the order of sorted node ids.
+    Coordinate based edge weight types are computed by broadcasting, and the others, such as EXPLICIT, are read from the networkx graph."""
+    if problem.edge_weight_type in coordinate_edge_weight_types and problem.node_coords:
+        node_ids = sorted(problem.node_coords)
+        coordinates = np.array([problem.node_coords[node_id] for node_id in node_ids], dtype=float)
+        return compute_distance_matrix(coordinates, problem.edge_weight_type, rounding)
+    return nx.to_numpy_array(problem.get_graph())
+
+
+def paired_distance(sources: np.ndarray, targets: np.ndarray, edge_weight_type: str="EUC_2D", rounding: bool=True) -> np.ndarray:
+    """Compute the distance between each source and the target at the same position, where the leading shapes of sources and targets broadcast.
+    The result is the same as the entry of pairwise_distance for the pair."""
+    assert edge_weight_type in coordinate_edge_weight_types, f"Edge weight type {edge_weight_type} is not in {coordinate_edge_weight_types}"
+    sources = np.asarray(sources, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    if edge_weight_type == "GEO":
+        sources, targets = geo_radians(sources), geo_radians(targets)
+        q1 = np.cos(sources[..., 1] - targets[..., 1])
+        q2 = np.cos(sources[..., 0] - targets[..., 0])
+        q3 = np.cos(sources[..., 0] + targets[..., 0])
+        return np.trunc(6378.388 * np.arccos(np.clip(0.5 * ((1 + q1) * q2 - (1 - q1) * q3), -1, 1)) + 1)
+    deltas = np.abs(sources - targets)
+    if edge_weight_type in ["MAN_2D", "MAN_3D"]:
+        distances = deltas.sum(axis=-1)
+        return nint(distances) if rounding else distances
+    if edge_weight_type in ["MAX_2D", "MAX_3D"]:
+        distances = deltas.max(axis=-1)
+        return nint(distances) if rounding else distances
+    squared_distances = (deltas * deltas).sum(axis=-1)
+    if edge_weight_type == "ATT":
+        distances = np.sqrt(squared_distances / 10)
+        rounded_distances = nint(distances)
+        return rounded_distances + (rounded_distances < distances)
+    distances = np.sqrt(squared_distances)
+    if not rounding:
+        return distances
+    if edge_weight_type == "CEIL_2D":
+        return np.ceil(distances)
+    return nint(distances)
+
+
+def compute_neighbor_lists(coordinates: np.ndarray, neighbor_num: int, edge_weight_type: str="EUC_2D", rounding: bool=True, block_size: int=256) -> np.ndarray:
+    """Get the neighbor_num nearest other nodes of each node, sorted by distance, with the temporary memory of one row block."""
+    coordinates = np.asarray(coordinates, dtype=float)
+    node_num = len(coordinates)
+    neighbor_num = min(neighbor_num, node_num - 1)
+    neighbor_lists = np.empty((node_num, neighbor_num), dtype=np.int64)
+    for start in range(0, node_num, block_size):
+        end = min(start + block_size, node_num)
+        distances = pairwise_distance(coordinates[start: end], coordinates, edge_weight_type, rounding)
+        distances[np.arange(end - start), np.arange(start, end)] = np.inf
+        candidates = np.argpartition(distances, neighbor_num - 1, axis=1)[:, :neighbor_num] if neighbor_num > 0 else np.empty((end - start, 0), dtype=np.int64)
+        order = np.argsort(np.take_along_axis(distances, candidates, axis=1), axis=1, kind="stable")
+        neighbor_lists[start: end] = np.take_along_axis(candidates, order, axis=1)
+    return neighbor_lists
+
+
+class ImplicitDistanceMatrix:
+    """Distance matrix that keeps only node coordinates and computes distances on demand, for instances too large for the dense matrix.
+
+    It supports the dense matrix idioms used by heuristics:
+        - matrix[i] returns the dense row, and the last row is cached so matrix[i][j] in a loop over j costs O(1) per access.
+        - matrix[i, j] computes one distance.
+        - matrix[nodes_a, nodes_b] computes the distances of the paired nodes by broadcasting, as numpy fancy indexing does.
+        - matrix[nodes] computes the dense rows of nodes.
+    Distance from a node to itself is 0.
+    """
+    def __init__(self, coordinates: np.ndarray, edge_weight_type: str="EUC_2D", rounding: bool=True, statistics: dict=None):
+        self.coordinates = coordinates
+        self.edge_weight_type = edge_weight_type
+        self.rounding = rounding
+        self.node_num = len(coordinates)
+        # Statistics of all distances, which cost O(node_num^2) and are computed at most once.
+        self.cached_statistics = statistics
+        # (row index, dense row) of the last accessed row, which is replaced as a whole so that threads sharing the matrix never see a mismatched pair.
+        self.cached_row: tuple[int, np.ndarray] = None
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.node_num, self.node_num)
+
+    def __len__(self) -> int:
+        return self.node_num
+
+    def __repr__(self) -> str:
+        return f"ImplicitDistanceMatrix(node_num={self.node_num}, edge_weight_type={self.edge_weight_type})"
+
+    def distance(self, sources: object, targets: object) -> object:
+        """Distance between the paired source and target nodes, which can be node ids or arrays of node ids."""
+        sources, targets = np.asarray(sources), np.asarray(targets)
+        distances = paired_distance(self.coordinates[sources], self.coordinates[targets], self.edge_weight_type, self.rounding)
+        distances = np.where(sources == targets, 0, distances)
+        return distances[()] if distances.ndim == 0 else distances
+
+    def __getitem__(self, key: object) -> object:
+        if isinstance(key, tuple):
+            rows, cols = self.to_nodes(key[0]), self.to_nodes(key[1])
+            cached_row = self.cached_row
+            if cached_row is not None and isinstance(rows, int) and cached_row[0] == rows:
+                return cached_row[1][cols]
+            return self.distance(rows, cols)
+        if isinstance(key, (int, np.integer)):
+            return self.dense_row(int(key))
+        return self.rows(self.to_nodes(key))
+
+    def dense_row(self, row: int) -> np.ndarray:
+        cached_row = self.cached_row
+        if cached_row is None or cached_row[0] != row:
+            dense_row = self.rows([row])[0]
+            # The cached row is shared by callers, so it is read-only.
+            dense_row.flags.writeable = False
+            cached_row = (row, dense_row)
+            self.cached_row = cached_row
+        return cached_row[1]
+
+    def to_nodes(self, index: object) -> object:
+        """Node ids selected by index, without building the full node range for the scalar and array indices used in loops."""
+        if isinstance(index, (int, np.integer)):
+            return int(index)
+        if isinstance(index, slice):
+            return np.arange(self.node_num)[index]
+        return np.asarray(index)
+
+    def rows(self, nodes: np.ndarray) -> np.ndarray:
+        """Dense rows of nodes with shape (len(nodes), node_num)."""
+        nodes = np.asarray(nodes)
+        distances = pairwise_distance(self.coordinates[nodes], self.coordinates, self.edge_weight_type, self.rounding)
+        distances[np.arange(len(nodes)), nodes] = 0
+        return distances
+
+    def row_blocks(self, nodes: np.ndarray=None, block_size: int=256):
+        """Yield the dense rows of nodes, all nodes by default, in blocks of block_size rows."""
+        nodes = np.arange(self.node_num) if nodes is None else np.asarray(nodes)
+        for start in range(0, len(nodes), block_size):
+            yield self.rows(nodes[start: start + block_size])
+
+    def statistics(self, block_size: int=256) -> dict:
+        """Sum, sum of squares, minimum non-zero and maximum of all distances, including the zero diagonal in sums.
+        Coordinate distances are symmetric, so only the strict upper triangle is computed, one row block at a time."""
+        if self.cached_statistics is None:
+            distance_sum, squared_distance_sum = 0.0, 0.0
+            min_distance, max_distance = np.inf, 0.0
+            for start in range(0, self.node_num, block_size):
+                end = min(start + block_size, self.node_num)
+                distances = pairwise_distance(self.coordinates[start: end], self.coordinates[start:], self.edge_weight_type, self.rounding)
+                # Keep the columns right of the diagonal in the square part of the block.
+                distances = distances[np.triu(np.ones(distances.shape, dtype=bool), k=1)]
+                distance_sum += 2 * distances.sum()
+                squared_distance_sum += 2 * np.square(distances).sum()
+                nonzero_distances = distances[distances != 0]
+                if len(nonzero_distances) > 0:
+                    min_distance = min(min_distance, float(nonzero_distances.min()))
+                if len(distances) > 0:
+                    max_distance = max(max_distance, float(distances.max()))
+            self.cached_statistics = {"distance_sum": float(distance_sum), "squared_distance_sum": float(squared_distance_sum), "min_distance": min_distance, "max_distance": max_distance}
+        return self.cached_statistics
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["cached_row"] = None
+        return state
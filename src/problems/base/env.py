@@ -1,21 +1,54 @@
 import os
+import copy
+import inspect
+import importlib
 import traceback
+from contextlib import nullcontext
 from src.problems.base.components import BaseSolution, BaseOperator
-from src.util.util import load_function, search_file
+from src.problems.base.budget import Budget
+from src.problems.base.instance_cache import InstanceCache
+from src.problems.base.lazy_problem_state import LazyProblemState
+from src.problems.base.profiler import HeuristicProfiler
+from src.problems.base.shared_instance import SharedInstanceData
+from src.problems.base.recorder import TrajectoryRecorder
+from src.util.util import search_file
 
 
 class BaseEnv:
     """Base env that stores the static global data, current solution, dynamic state and provide necessary to support algorithm."""
+    # Compute the solution problem state and key item on first read instead of after every operator.
+    # Problems whose get_solution_problem_state returns None for some solutions need the eager mode to keep get_problem_state returning None.
+    lazy_problem_state: bool = True
+    # Cache the parsed instance data on disk by the content hash of the data, so repeat loads skip parsing.
+    use_instance_cache: bool = True
+    # Format version of the cached instance data, which is raised when cached data of an earlier version can no longer be used.
+    instance_cache_version: int = 1
+    # Modules of the helpers that load_data calls, whose source is part of the instance cache key besides the source of load_data.
+    instance_data_modules: list[str] = []
+
     def __init__(self, data_name: str, problem: str, **kwargs):
         self.problem = problem
         self.data_path = search_file(data_name, problem)
         self.data_ref_name = data_name.split(os.sep)[-1]
         assert self.data_path is not None
-        self.instance_data: tuple = self.load_data(self.data_path)
+        self.instance_data: dict = self.load_instance_data(self.data_path)
         self.current_solution: BaseSolution = self.init_solution()
+        # Version of current solution, which increases whenever current solution changes.
+        # Key value and validation of current solution are cached as (version, value) against it.
+        self.solution_version: int = 0
+        self.key_value_cache: tuple[int, float] = None
+        self.validation_cache: tuple[int, bool] = None
         self.algorithm_data: dict = None
-        self.recordings: list[tuple] = None
+        self.recordings: TrajectoryRecorder = None
+        # Mode, sample interval and max records of recordings, which are set by set_recording.
+        self.recording_config: dict = {"mode": "full", "sample_interval": 1, "max_records": None}
         self.output_dir: str = None
+        # Time, step and stagnation limits of the run, which are set by set_budget and checked in continue_run.
+        self.budget: Budget = None
+        # Per heuristic profiler of run_heuristic, which is set by set_profiler.
+        self.profiler: HeuristicProfiler = None
+        # Owner of the shared memory that holds the instance arrays, which is set by share_instance_data.
+        self.shared_instance_data: SharedInstanceData = None
         # Maximum step to constructive a complete solution
         self.construction_steps: int = None
         # Key item in state to compare the solution
@@ -24,11 +57,27 @@ class BaseEnv:
         # A return value greater than 0 indicates that first is better and the larger the number, the greater the advantage.
         self.compare: callable = None
 
+        self.load_problem_state_functions()
+        # Instance problem state only depends on instance data, so it is computed once per loaded instance.
+        self.instance_problem_state: dict = self.get_instance_problem_state(self.instance_data)
+        # Solution problem state of current solution, and the (previous solution problem state, operator) to update it incrementally.
+        self.solution_problem_state: dict = self.get_solution_problem_state(self.instance_data, self.current_solution)
+        self.solution_problem_state_update: tuple[dict, BaseOperator] = None
+        # Keys of the solution problem state, which are registered as lazy items in problem state.
+        self.solution_problem_state_keys: list[str] = list(self.solution_problem_state.keys()) if self.solution_problem_state else None
+        self.problem_state = self.get_problem_state()
+
+    def load_problem_state_functions(self) -> None:
         problem_state_file = search_file("problem_state.py", problem=self.problem)
         assert problem_state_file is not None, f"Problem state code file {problem_state_file} does not exist"
-        self.get_instance_problem_state = load_function(problem_state_file, problem=self.problem, function_name="get_instance_problem_state")
-        self.get_solution_problem_state = load_function(problem_state_file, problem=self.problem, function_name="get_solution_problem_state")
-        self.problem_state = self.get_problem_state()
+        # Load the module once in its own namespace, so functions of problem state files loaded before are never picked up.
+        problem_state_module = {}
+        with open(problem_state_file) as file:
+            exec(file.read(), problem_state_module)
+        self.get_instance_problem_state = problem_state_module["get_instance_problem_state"]
+        self.get_solution_problem_state = problem_state_module["get_solution_problem_state"]
+        # update_solution_problem_state is optional, and run_operator falls back to get_solution_problem_state without it.
+        self.update_solution_problem_state = problem_state_module.get("update_solution_problem_state")
 
 
     @property
@@ -37,26 +86,45 @@ class BaseEnv:
 
     @property
     def is_valid_solution(self) -> bool:
-        return self.validation_solution(self.current_solution)
+        if self.validation_cache is None or self.validation_cache[0] != self.solution_version:
+            self.validation_cache = (self.solution_version, self.validation_solution(self.current_solution))
+        return self.validation_cache[1]
 
     @property
     def continue_run(self) -> bool:
-        return True
+        return self.budget is None or not self.budget.is_exhausted
 
     @property
     def key_value(self) -> float:
-        """Get the key value of the current solution."""
-        return self.get_key_value(self.current_solution)
+        """Get the key value of the current solution, which is computed once per solution version."""
+        if self.key_value_cache is None or self.key_value_cache[0] != self.solution_version:
+            with self.profile("key_value"):
+                self.key_value_cache = (self.solution_version, self.get_key_value(self.current_solution))
+        return self.key_value_cache[1]
 
     def get_key_value(self, solution: BaseSolution=None) -> float:
         """Get the key value of the solution."""
         pass
 
+    def estimate_key_value(self) -> float:
+        """Estimate the key value of a complete solution reached from the current solution, which scores truncated rollouts in TTS.
+        None means the problem has no estimate for partial solutions, and truncated rollouts are completed instead."""
+        if self.is_complete_solution:
+            return self.key_value
+        return None
+
     def reset(self, output_dir: str=None):
         self.current_solution = self.init_solution()
+        self.solution_version += 1
+        self.solution_problem_state = None
+        self.solution_problem_state_update = None
         self.problem_state = self.get_problem_state()
         self.algorithm_data = {}
-        self.recordings = []
+        self.recordings = TrajectoryRecorder(compare=self.compare, **self.recording_config)
+        if self.budget is not None:
+            self.budget.start()
+        if self.profiler is not None:
+            self.profiler.reset()
         if output_dir:
             if os.sep in output_dir:
                 self.output_dir = output_dir
@@ -65,6 +133,108 @@ class BaseEnv:
                 self.output_dir = os.path.join(base_output_dir, self.problem, "result", self.data_ref_name, output_dir)
             os.makedirs(self.output_dir, exist_ok=True)
 
+    def snapshot(self) -> dict:
+        """Capture the current solution, algorithm data and step counter to restore later.
+        Instance data and instance problem state are immutable, so they are shared by reference instead of being copied."""
+        # Solutions may reference instance arrays, such as the job operation sequence in JSSP, which should not be copied.
+        memo = {id(value): value for value in self.instance_data.values()}
+        return {
+            "current_solution": copy.deepcopy(self.current_solution, memo),
+            "algorithm_data": copy.deepcopy(self.algorithm_data, memo),
+            "recording_checkpoint": None if self.recordings is None else self.recordings.checkpoint(),
+            # Solution problem states are replaced instead of modified after operators, so the references are enough.
+            "solution_problem_state": self.solution_problem_state,
+            "solution_problem_state_update": self.solution_problem_state_update,
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        """Restore the env to the snapshot. The same snapshot can be restored multiple times."""
+        memo = {id(value): value for value in self.instance_data.values()}
+        self.current_solution = copy.deepcopy(snapshot["current_solution"], memo)
+        self.solution_version += 1
+        self.algorithm_data = copy.deepcopy(snapshot["algorithm_data"], memo)
+        if snapshot["recording_checkpoint"] is not None and self.recordings is not None:
+            self.recordings.rollback(snapshot["recording_checkpoint"])
+        self.solution_problem_state = snapshot["solution_problem_state"]
+        self.solution_problem_state_update = snapshot["solution_problem_state_update"]
+        self.problem_state = self.get_problem_state()
+
+    def fork(self) -> "BaseEnv":
+        """Create a branch of the env to run independently, which shares instance data and problem state functions with this env."""
+        # Bypass __getstate__ so that the problem state functions are not loaded again.
+        env = self.__class__.__new__(self.__class__)
+        env.__dict__.update(self.__dict__)
+        env.recordings = None if self.recordings is None else self.recordings.copy()
+        # Runs on the branch are what-ifs, which do not consume the budget of this env.
+        env.budget = None
+        env.profiler = None
+        env.restore(self.snapshot())
+        return env
+
+    def share_instance_data(self, min_nbytes: int=1 << 20) -> SharedInstanceData:
+        """Place the instance arrays with at least min_nbytes bytes in shared memory, so worker processes attach them instead of receiving copies.
+        Arrays become read-only. Forks share the memory, and calling it again keeps the existing shared memory."""
+        if self.shared_instance_data is None:
+            self.shared_instance_data = SharedInstanceData(self.instance_data, min_nbytes)
+        return self.shared_instance_data
+
+    def set_recording(self, mode: str="full", sample_interval: int=1, max_records: int=None) -> None:
+        """Set how the operations are recorded for this and following resets.
+        mode is one of "full", "sample" (every sample_interval operations) and "improvement" (only operations that improve the key value).
+        When max_records is set, the recordings are downsampled to keep at most max_records operations."""
+        self.recording_config = {"mode": mode, "sample_interval": sample_interval, "max_records": max_records}
+        self.recordings = TrajectoryRecorder(compare=self.compare, **self.recording_config)
+
+    def set_budget(self, time_limit: float=None, max_steps: int=None, stagnation_steps: int=None) -> Budget:
+        """Set the budget for this and following resets. continue_run turns False once any limit is reached.
+        time_limit is in wall-clock seconds since reset, max_steps counts heuristic runs and stagnation_steps counts heuristic runs without improvement."""
+        self.budget = Budget(time_limit=time_limit, max_steps=max_steps, stagnation_steps=stagnation_steps)
+        return self.budget
+
+    def set_profiler(self, enabled: bool=True) -> HeuristicProfiler:
+        """Enable or disable the per heuristic profiler of run_heuristic for this and following resets."""
+        self.profiler = HeuristicProfiler() if enabled else None
+        return self.profiler
+
+    def profile(self, section: str):
+        """Context to count the time of the section in the profiler, which does nothing when profiler is disabled."""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.section(section)
+
+    def restore_best_solution(self) -> bool:
+        """Replace the current solution with the best complete solution in budget if it is better. Return whether the current solution is replaced."""
+        if self.budget is None or self.budget.best_solution is None:
+            return False
+        if self.is_complete_solution and self.compare(self.key_value, self.budget.best_key_value) >= 0:
+            return False
+        memo = {id(value): value for value in self.instance_data.values()}
+        self.current_solution = copy.deepcopy(self.budget.best_solution, memo)
+        self.solution_version += 1
+        self.solution_problem_state = None
+        self.solution_problem_state_update = None
+        self.problem_state = self.get_problem_state()
+        return True
+
+    def load_instance_data(self, data_path: str) -> dict:
+        """Load the instance data by load_data, through the instance cache when use_instance_cache is set."""
+        if not self.use_instance_cache:
+            return self.load_data(data_path)
+        base_output_dir = os.path.join(os.getenv("AMLT_OUTPUT_DIR"), "..", "..", "output") if os.getenv("AMLT_OUTPUT_DIR") else "output"
+        instance_cache = InstanceCache(os.path.join(base_output_dir, "cache", "instance_data", self.problem))
+        return instance_cache.load(data_path, self.load_data, salt=self.get_instance_cache_salt())
+
+    def get_instance_cache_salt(self) -> str:
+        """Salt of the instance cache key, which changes with anything that changes the output of load_data."""
+        # The source of load_data and its helper modules are part of the key, so the cache is refreshed when the loader changes.
+        salt = f"version={self.instance_cache_version}\n"
+        for source in [type(self).load_data] + [importlib.import_module(module) for module in self.instance_data_modules]:
+            try:
+                salt += inspect.getsource(source)
+            except (OSError, TypeError):
+                salt += getattr(source, "__qualname__", source.__name__)
+        return salt
+
     def load_data(self, data_path: str) -> dict:
         pass
 
@@ -72,53 +242,148 @@ class BaseEnv:
         pass
 
     def helper_function(self) -> dict:
-        return {"get_problem_state": self.get_problem_state, "validation_solution": self.validation_solution}
+        return {"get_problem_state": self.get_problem_state, "validation_solution": self.validation_solution, "evaluate_operators": self.evaluate_operators}
+
+    def evaluate_operators(self, operators: list[BaseOperator], problem_state_keys: list[str]=None) -> list:
+        """Evaluate the candidate operators on the current solution without changing it.
+
+        Args:
+            operators (list[BaseOperator]): The candidate operators, each of them runs on the current solution separately.
+            problem_state_keys (list[str], optional): The solution problem state items to return together with the key value.
+
+        Returns:
+            list: The key value after each operator when problem_state_keys is None, otherwise the dict with key item and the problem_state_keys items after each operator.
+            The result is None for the operator that fails to run on the current solution.
+        """
+        results = [None] * len(operators)
+        batch_results = self.evaluate_operators_in_batch(operators) if problem_state_keys is None else {}
+        memo = {id(value): value for value in self.instance_data.values()}
+        working_solution = None
+        for index, operator in enumerate(operators):
+            if index in batch_results:
+                results[index] = batch_results[index]
+                continue
+            if working_solution is None:
+                working_solution = copy.deepcopy(self.current_solution, memo)
+            try:
+                undo_token = operator.run_inplace(working_solution)
+            except Exception:
+                # The failed operator may leave the working solution partially modified.
+                working_solution = None
+                continue
+            key_value = self.get_key_value(working_solution)
+            if problem_state_keys is None:
+                results[index] = key_value
+            else:
+                solution_problem_state = self.get_solution_problem_state(self.instance_data, working_solution)
+                if solution_problem_state is not None:
+                    results[index] = {self.key_item: key_value, **{key: solution_problem_state[key] for key in problem_state_keys if key in solution_problem_state}}
+            operator.undo(working_solution, undo_token)
+        return results
+
+    def evaluate_operators_in_batch(self, operators: list[BaseOperator]) -> dict[int, float]:
+        """Evaluate the key value after the operators which the problem can vectorize, keyed by their index in operators.
+        The other operators are evaluated one by one in evaluate_operators."""
+        return {}
 
     def get_problem_state(self, solution: BaseSolution=None) -> dict:
         if solution is None:
             solution = self.current_solution
-        instance_problem_state = self.get_instance_problem_state(self.instance_data)
-        solution_problem_state = self.get_solution_problem_state(self.instance_data, solution)
         helper_function = self.helper_function()
+        if self.lazy_problem_state and self.solution_problem_state_keys:
+            problem_state = LazyProblemState({
+                **self.instance_data,
+                "current_solution": solution,
+                **helper_function,
+                **self.instance_problem_state,
+            })
+            problem_state.add_loader(self.solution_problem_state_keys, lambda: self.get_solution_problem_state_of(solution))
+            if self.key_item is not None:
+                problem_state.add_loader([self.key_item], lambda: {self.key_item: self.get_key_value_of(solution)})
+            return problem_state
+
+        solution_problem_state = self.get_solution_problem_state_of(solution)
         problem_state = None
         if solution_problem_state:
             problem_state = {
                 **self.instance_data,
                 "current_solution": solution,
-                self.key_item: self.key_value,
+                self.key_item: self.get_key_value_of(solution),
                 **helper_function,
-                **instance_problem_state,
+                **self.instance_problem_state,
                 **solution_problem_state,
             }
         return problem_state
 
+    def get_solution_problem_state_of(self, solution: BaseSolution) -> dict:
+        """Get the solution problem state of the solution, which is cached for the current solution and profiled for other solutions too."""
+        if solution is self.current_solution:
+            return self.get_current_solution_problem_state()
+        with self.profile("solution_problem_state"):
+            return self.get_solution_problem_state(self.instance_data, solution)
+
+    def get_key_value_of(self, solution: BaseSolution) -> float:
+        if solution is self.current_solution:
+            return self.key_value
+        with self.profile("key_value"):
+            return self.get_key_value(solution)
+
+    def get_current_solution_problem_state(self) -> dict:
+        """Get the solution problem state of current solution, updated incrementally from the previous one when update_solution_problem_state supports the last operator."""
+        if self.solution_problem_state is None:
+            with self.profile("solution_problem_state"):
+                if self.solution_problem_state_update is not None:
+                    previous_solution_problem_state, operator = self.solution_problem_state_update
+                    self.solution_problem_state = self.update_solution_problem_state(self.instance_data, previous_solution_problem_state, operator, self.current_solution)
+                self.solution_problem_state_update = None
+                if self.solution_problem_state is None:
+                    self.solution_problem_state = self.get_solution_problem_state(self.instance_data, self.current_solution)
+        return self.solution_problem_state
+
     def validation_solution(self, solution: BaseSolution=None) -> bool:
         """Check the validation of this solution"""
         pass
 
     def run_heuristic(self, heuristic: callable, parameters:dict={}, add_record_item: dict={}) -> BaseOperator:
-        try:
-            operator, delta = heuristic(
-                problem_state=self.problem_state,
-                algorithm_data=self.algorithm_data,
-                **parameters
-            )
-            if isinstance(operator, BaseOperator):
-                self.run_operator(operator)
-                self.algorithm_data.update(delta)
-            record_item = {"operation_id": len(self.recordings), "heuristic": heuristic.__name__, "operator": operator}
-            record_item.update(add_record_item)
-            self.recordings.append(record_item)
-            return operator
-        except Exception as e:
-            trace_string = traceback.format_exc()
-            print(trace_string)
-            return trace_string
-
-    def run_operator(self, operator: BaseOperator) -> bool:
+        with self.profiler.run(heuristic.__name__) if self.profiler is not None else nullcontext():
+            try:
+                with self.profile("heuristic"):
+                    operator, delta = heuristic(
+                        problem_state=self.problem_state,
+                        algorithm_data=self.algorithm_data,
+                        **parameters
+                    )
+                if isinstance(operator, BaseOperator):
+                    self.run_operator(operator)
+                    self.algorithm_data.update(delta)
+                record_item = {"heuristic": heuristic.__name__, "operator": operator}
+                record_item.update(add_record_item)
+                self.recordings.record(record_item, lambda: self.key_value)
+                if self.budget is not None:
+                    self.budget.step(self)
+                return operator
+            except Exception as e:
+                trace_string = traceback.format_exc()
+                print(trace_string)
+                return trace_string
+
+    def run_operator(self, operator: BaseOperator, inplace: bool=False) -> bool:
         if isinstance(operator, BaseOperator):
-            self.current_solution = operator.run(self.current_solution)
-            self.problem_state = self.get_problem_state()
+            previous_solution_problem_state = self.solution_problem_state
+            with self.profile("operator"):
+                if inplace:
+                    # Modify the current solution without copy. Solutions from previous snapshots or problem states are modified together.
+                    operator.run_inplace(self.current_solution)
+                else:
+                    self.current_solution = operator.run(self.current_solution)
+            self.solution_version += 1
+            self.solution_problem_state = None
+            # Only a computed state can be updated, otherwise the state is extracted in full when it is read.
+            self.solution_problem_state_update = None
+            if previous_solution_problem_state is not None and self.update_solution_problem_state is not None:
+                self.solution_problem_state_update = (previous_solution_problem_state, operator)
+            with self.profile("problem_state_build"):
+                self.problem_state = self.get_problem_state()
         return operator
 
     def summarize_env(self) -> str:
@@ -128,12 +393,35 @@ class BaseEnv:
         state = self.__dict__.copy()  
         state.pop("get_instance_problem_state", None)
         state.pop("get_solution_problem_state", None)
+        state.pop("update_solution_problem_state", None)
+        # Problem state holds loaders bound to this env and is rebuilt after loading.
+        state.pop("problem_state", None)
+        # Shared memory is owned by the process that creates it, and loaded envs only attach the arrays.
+        state["shared_instance_data"] = None
         return state  
   
     def __setstate__(self, state):  
         self.__dict__.update(state)  
-        self.get_instance_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_instance_problem_state")
-        self.get_solution_problem_state = load_function("problem_state.py", problem=self.problem, function_name="get_solution_problem_state")
+        self.load_problem_state_functions()
+        if "instance_problem_state" not in state:
+            self.instance_problem_state = self.get_instance_problem_state(self.instance_data)
+        if "shared_instance_data" not in state:
+            self.shared_instance_data = None
+        if "solution_version" not in state:
+            self.solution_version = 0
+            self.key_value_cache = None
+            self.validation_cache = None
+        if "solution_problem_state_keys" not in state:
+            self.solution_problem_state = None
+            self.solution_problem_state_update = None
+            self.solution_problem_state_keys = None
+        self.problem_state = self.get_problem_state()
+
+    def dump_profile(self, result_file: str="profile.txt") -> str:
+        """Dump the per heuristic profile report next to the result."""
+        if self.profiler is None or self.output_dir is None:
+            return None
+        return self.profiler.dump(os.path.join(self.output_dir, result_file))
 
     def dump_result(self, content_dict: dict={}, dump_records: list=["operation_id", "operator", "heuristic"], result_file: str="result.txt") -> str:
         content = f"-data: {self.data_path}\n"
@@ -143,14 +431,10 @@ class BaseEnv:
         content += f"-{self.key_item}: {self.key_value}\n"
         for item, value in content_dict.items():
             content += f"-{item}: {value}\n"
-        if dump_records and len(dump_records) > 0 and len(self.recordings) > 0 and len(self.recordings[0].keys()) > 0:
-            dump_records = [item for item in dump_records if item in self.recordings[0].keys()]
+        if dump_records and len(dump_records) > 0 and len(self.recordings) > 0:
+            dump_records = [item for item in dump_records if item in self.recordings.keys()]
             content += "-trajectory:\n" + "\t".join(dump_records) + "\n"
-            trajectory_str = "\n".join([
-                "\t".join([str(recording_item.get(item, "None")) for item in dump_records])
-                for recording_item in self.recordings
-            ])
-            content += trajectory_str
+            content += "\n".join(self.recordings.iter_rows(dump_records))
 
         if self.output_dir != None and result_file != None:
             output_file = os.path.join(self.output_dir, result_file)
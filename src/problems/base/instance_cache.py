@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+
+class InstanceCache:
+    """On-disk cache of parsed instance data, keyed by the content hash of the data file and the source of the loader.
+
+    Each entry is a directory with one .npy file per array item and a meta.json for the other items.
+    Arrays are opened with copy-on-write memory map, so repeat loads do not copy large matrices and writes never reach the cache.
+    Instance data with items that are neither arrays nor JSON values is loaded without cache.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def load(self, data_path: str, load_data: callable, salt: str="") -> dict:
+        """Load the instance data of data_path from cache, or by load_data and save it to cache on miss."""
+        entry_dir = os.path.join(self.cache_dir, self.get_key(data_path, salt))
+        if os.path.exists(os.path.join(entry_dir, "meta.json")):
+            try:
+                return self.read(entry_dir)
+            except Exception:
+                # Broken entry, such as one from an interrupted old version, is replaced below.
+                pass
+        instance_data = load_data(data_path)
+        if self.is_cacheable(instance_data):
+            try:
+                self.write(entry_dir, instance_data)
+            except OSError:
+                pass
+        return instance_data
+
+    def get_key(self, data_path: str, salt: str) -> str:
+        hasher = hashlib.sha256(salt.encode())
+        if os.path.isdir(data_path):
+            # Hash the relative file names and contents of instance stored as a directory, such as dposp.
+            for root, dirs, files in os.walk(data_path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    file_path = os.path.join(root, file_name)
+                    hasher.update(os.path.relpath(file_path, data_path).encode())
+                    self.update_hash(hasher, file_path)
+        else:
+            self.update_hash(hasher, data_path)
+        return hasher.hexdigest()
+
+    def update_hash(self, hasher: "hashlib._Hash", file_path: str) -> None:
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                hasher.update(chunk)
+
+    def is_cacheable(self, instance_data: dict) -> bool:
+        if not isinstance(instance_data, dict):
+            return False
+        for value in instance_data.values():
+            if isinstance(value, np.ndarray):
+                if value.dtype.hasobject:
+                    return False
+            elif not isinstance(value, np.generic):
+                try:
+                    # Items changed by JSON, such as tuples and dicts with non-string keys, are not cacheable.
+                    if json.loads(json.dumps(value)) != value:
+                        return False
+                except (TypeError, ValueError):
+                    return False
+        return True
+
+    def read(self, entry_dir: str) -> dict:
+        with open(os.path.join(entry_dir, "meta.json")) as file:
+            meta = json.load(file)
+        instance_data = {}
+        for key, item in meta.items():
+            if item["type"] == "array":
+                # Plain array view on the memory map, which is pickled by value when the env is sent to other processes.
+                instance_data[key] = np.load(os.path.join(entry_dir, item["file"]), mmap_mode="c").view(np.ndarray)
+            elif item["type"] == "scalar":
+                # Numpy scalars keep their dtype, so loaded data behaves the same as parsed data.
+                instance_data[key] = np.dtype(item["dtype"]).type(item["value"])
+            else:
+                instance_data[key] = item["value"]
+        return instance_data
+
+    def write(self, entry_dir: str, instance_data: dict) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary directory and rename it, so concurrent loaders never read a partial entry.
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            meta = {}
+            for index, (key, value) in enumerate(instance_data.items()):
+                if isinstance(value, np.ndarray):
+                    file_name = f"{index}.npy"
+                    np.save(os.path.join(temp_dir, file_name), value)
+                    meta[key] = {"type": "array", "file": file_name}
+                elif isinstance(value, np.generic):
+                    meta[key] = {"type": "scalar", "dtype": value.dtype.str, "value": value.item()}
+                else:
+                    meta[key] = {"type": "json", "value": value}
+            with open(os.path.join(temp_dir, "meta.json"), "w") as file:
+                json.dump(meta, file)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process has written the same entry.
+            shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,115 @@
+class LazyProblemState(dict):
+    """Problem state dict whose expensive items are computed on first read and memoized afterwards.
+
+    Items are registered by add_loader with a loader that returns a dict of one or more items.
+    The loader runs once, when any of its items is read for the first time.
+    Reading items keeps the other loaders pending. Exporting the whole mapping (keys, values, items, copy, repr) resolves everything first,
+    so heuristics and prompts still see a plain dict.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaders: dict[object, callable] = {}
+        # Keys deleted by caller, which loaders of other keys must not add back.
+        self._deleted_keys: set = set()
+
+    def add_loader(self, keys: list, loader: callable) -> None:
+        """Register the loader for keys. Lazy items override the eager items with the same key."""
+        for key in keys:
+            dict.pop(self, key, None)
+            self._deleted_keys.discard(key)
+            self._loaders[key] = loader
+
+    def resolve(self) -> "LazyProblemState":
+        """Run all pending loaders."""
+        while self._loaders:
+            self._load(next(iter(self._loaders)))
+        return self
+
+    def _load(self, key: object) -> None:
+        loader = self._loaders[key]
+        for pending_key in [pending_key for pending_key, pending_loader in self._loaders.items() if pending_loader is loader]:
+            del self._loaders[pending_key]
+        values = loader() or {}
+        for loaded_key, value in values.items():
+            # Items loaded earlier by another loader or set by caller are kept.
+            if not dict.__contains__(self, loaded_key) and loaded_key not in self._deleted_keys:
+                dict.__setitem__(self, loaded_key, value)
+
+    def __missing__(self, key: object) -> object:
+        if key in self._loaders:
+            self._load(key)
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return dict.__contains__(self, key) or key in self._loaders
+
+    def __iter__(self):
+        yield from list(dict.keys(self))
+        yield from [key for key in list(self._loaders) if not dict.__contains__(self, key)]
+
+    def __len__(self) -> int:
+        # Pending keys already loaded by another loader are counted once, as in __iter__.
+        return dict.__len__(self) + sum(1 for key in self._loaders if not dict.__contains__(self, key))
+
+    def __setitem__(self, key: object, value: object) -> None:
+        self._loaders.pop(key, None)
+        self._deleted_keys.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: object) -> None:
+        is_pending = self._loaders.pop(key, None) is not None
+        is_loaded = dict.pop(self, key, KeyError) is not KeyError
+        if not is_pending and not is_loaded:
+            raise KeyError(key)
+        self._deleted_keys.add(key)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyProblemState):
+            other.resolve()
+        return dict.__eq__(self.resolve(), other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self.__eq__(other)
+
+    def __repr__(self) -> str:
+        return dict.__repr__(self.resolve())
+
+    def __reduce__(self):
+        return (dict, (dict(self.resolve().items()),))
+
+    def get(self, key: object, default: object=None) -> object:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return dict.keys(self.resolve())
+
+    def values(self):
+        return dict.values(self.resolve())
+
+    def items(self):
+        return dict.items(self.resolve())
+
+    def copy(self) -> dict:
+        return dict(self.resolve().items())
+
+    def pop(self, key: object, *default: object) -> object:
+        if key in self._loaders:
+            self._load(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self) -> tuple:
+        return dict.popitem(self.resolve())
+
+    def setdefault(self, key: object, default: object=None) -> object:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
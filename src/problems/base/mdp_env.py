@@ -18,7 +18,7 @@ class MDPEnv(BaseEnv):
 
     @property
     def continue_run(self) -> bool:
-        return not self.done
+        return not self.done and super().continue_run
 
     def reset(self, output_dir: str=None):
         self.gym_env.reset()
@@ -52,6 +52,8 @@ class MDPEnv(BaseEnv):
                 self.reward += reward
             elif isinstance(reward, list):
                 self.reward += sum(reward)
+            # Key value is the accumulated reward, which changes with every step.
+            self.solution_version += 1
             return True
         return False
     
@@ -0,0 +1,80 @@
+import sys
+import time
+import pandas as pd
+from contextlib import contextmanager
+from src.util.util import df_to_str
+
+
+class HeuristicProfiler:
+    """Profiler that aggregates the cost of run_heuristic per heuristic name.
+
+    Each heuristic run is split into sections:
+        - heuristic: Time in the heuristic body.
+        - operator: Time in operator.run or operator.run_inplace.
+        - problem_state_build: Time to build the problem state dict from instance data, instance problem state and helper functions. The instance problem state itself is computed once per env, outside heuristic runs.
+        - solution_problem_state: Time to compute or incrementally update the solution problem state.
+        - key_value: Time to compute the key value.
+    Section times are exclusive, so the time of a section nested in another one, such as the lazy solution problem state read in the heuristic body, is only counted once.
+    The rest of the run, such as recording, is reported as other.
+    Allocations are the net number of memory blocks allocated during the run, from sys.getallocatedblocks.
+    """
+    sections = ["heuristic", "operator", "problem_state_build", "solution_problem_state", "key_value"]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.stats: dict[str, dict] = {}
+        self.current_stats: dict = None
+        # Time spent in nested sections, which is excluded from the section outside.
+        self.nested_times: list[float] = []
+
+    @contextmanager
+    def run(self, heuristic_name: str):
+        """Profile one heuristic run. Sections entered inside are attributed to the heuristic."""
+        if heuristic_name not in self.stats:
+            self.stats[heuristic_name] = {"calls": 0, "total_time": 0.0, **{f"{section}_time": 0.0 for section in self.sections}, "allocated_blocks": 0}
+        previous_stats = self.current_stats
+        self.current_stats = self.stats[heuristic_name]
+        allocated_blocks = sys.getallocatedblocks()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current_stats["calls"] += 1
+            self.current_stats["total_time"] += time.perf_counter() - start_time
+            self.current_stats["allocated_blocks"] += sys.getallocatedblocks() - allocated_blocks
+            self.current_stats = previous_stats
+
+    @contextmanager
+    def section(self, section: str):
+        if self.current_stats is None:
+            yield
+            return
+        self.nested_times.append(0.0)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_time = time.perf_counter() - start_time
+            nested_time = self.nested_times.pop()
+            self.current_stats[f"{section}_time"] += elapsed_time - nested_time
+            if self.nested_times:
+                self.nested_times[-1] += elapsed_time
+
+    def report(self) -> pd.DataFrame:
+        rows = []
+        for heuristic_name, stats in self.stats.items():
+            row = {"heuristic": heuristic_name, **stats}
+            row["other_time"] = stats["total_time"] - sum(stats[f"{section}_time"] for section in self.sections)
+            row["time_per_call"] = stats["total_time"] / stats["calls"] if stats["calls"] > 0 else 0.0
+            rows.append(row)
+        columns = ["heuristic", "calls", "total_time", "time_per_call"] + [f"{section}_time" for section in self.sections] + ["other_time", "allocated_blocks"]
+        df = pd.DataFrame(rows, columns=columns).sort_values("total_time", ascending=False)
+        return df.round(6)
+
+    def dump(self, output_file: str) -> str:
+        content = df_to_str(self.report())
+        with open(output_file, "w") as file:
+            file.write(content)
+        return content
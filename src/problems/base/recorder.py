@@ -0,0 +1,171 @@
+import bisect
+from array import array
+from src.problems.base.components import BaseOperator
+
+
+class OperatorRecord(tuple):
+    """Compact record of an operator as its class name and its (name, value) arguments, which prints like the operator."""
+    __slots__ = ()
+
+    def __new__(cls, name: str, args: tuple):
+        return super().__new__(cls, (name, args))
+
+    def __getnewargs__(self) -> tuple:
+        return tuple(self)
+
+    @classmethod
+    def from_operator(cls, operator: BaseOperator) -> object:
+        # Operators that format themselves are kept as their string, so the dumped text stays the same.
+        if type(operator).__str__ is not BaseOperator.__str__:
+            return str(operator)
+        return cls(type(operator).__name__, tuple(operator.__dict__.items()))
+
+    @property
+    def name(self) -> str:
+        return self[0]
+
+    @property
+    def args(self) -> dict:
+        return dict(self[1])
+
+    def __str__(self) -> str:
+        params = ', '.join(f"{key}={value}" for key, value in self[1])
+        return f"{self[0]}({params})"
+
+
+class TrajectoryRecorder:
+    """Columnar recorder for the operations run by env.
+
+    Operation ids and heuristic ids are stored in compact arrays and heuristic names are stored once in a lookup table.
+    Other record items, such as operator and selection step, are stored as one column per item, and operators are stored as OperatorRecord.
+    Modes:
+        - "full": Record every operation.
+        - "sample": Record every sample_interval operations.
+        - "improvement": Record the operations that improve the best key value so far.
+    When max_records is set and exceeded, every other record is dropped and the sample interval is doubled, so memory stays bounded in long runs.
+    """
+    modes = ["full", "sample", "improvement"]
+
+    def __init__(self, mode: str="full", sample_interval: int=1, max_records: int=None, compare: callable=None):
+        assert mode in self.modes, f"Record mode {mode} is not in {self.modes}"
+        assert mode != "improvement" or compare is not None, "Improvement mode needs compare function"
+        self.mode = mode
+        self.sample_interval = max(1, sample_interval)
+        self.max_records = max_records
+        self.compare = compare
+        # Number of operations seen, including the ones not recorded.
+        self.operation_num = 0
+        self.best_key_value = None
+        self.operation_ids = array("q")
+        self.heuristic_ids = array("i")
+        self.heuristic_names: list[str] = []
+        self.heuristic_name_to_id: dict[str, int] = {}
+        self.columns: dict[str, list] = {}
+
+    def record(self, record_item: dict, get_key_value: callable=None) -> bool:
+        """Record the operation with heuristic name in record_item["heuristic"] and other items. Return whether it is kept.
+        get_key_value is only called in improvement mode to get the key value after the operation."""
+        operation_id = self.operation_num
+        self.operation_num += 1
+        if self.mode == "sample" and operation_id % self.sample_interval != 0:
+            return False
+        if self.mode == "improvement":
+            key_value = get_key_value()
+            if key_value is None or (self.best_key_value is not None and self.compare(key_value, self.best_key_value) <= 0):
+                return False
+            self.best_key_value = key_value
+
+        heuristic_name = str(record_item.get("heuristic"))
+        if heuristic_name not in self.heuristic_name_to_id:
+            self.heuristic_name_to_id[heuristic_name] = len(self.heuristic_names)
+            self.heuristic_names.append(heuristic_name)
+        self.operation_ids.append(operation_id)
+        self.heuristic_ids.append(self.heuristic_name_to_id[heuristic_name])
+        for item, value in record_item.items():
+            if item in ["operation_id", "heuristic"]:
+                continue
+            if item not in self.columns:
+                self.columns[item] = [None] * (len(self.operation_ids) - 1)
+            if isinstance(value, BaseOperator):
+                value = OperatorRecord.from_operator(value)
+            self.columns[item].append(value)
+        for column in self.columns.values():
+            if len(column) < len(self.operation_ids):
+                column.append(None)
+
+        if self.max_records is not None and len(self.operation_ids) > self.max_records:
+            self.downsample()
+        return True
+
+    def downsample(self) -> None:
+        """Drop every other record while keeping the latest one, and double the sample interval for the following operations."""
+        kept_indices = range((len(self.operation_ids) - 1) % 2, len(self.operation_ids), 2)
+        self.select(kept_indices)
+        if self.mode == "full":
+            self.mode = "sample"
+        if self.mode == "sample":
+            self.sample_interval *= 2
+
+    def select(self, indices: range) -> None:
+        self.operation_ids = array("q", [self.operation_ids[index] for index in indices])
+        self.heuristic_ids = array("i", [self.heuristic_ids[index] for index in indices])
+        self.columns = {item: [column[index] for index in indices] for item, column in self.columns.items()}
+
+    def checkpoint(self) -> tuple:
+        """Get the checkpoint to roll back the recorder to."""
+        return self.operation_num, self.best_key_value
+
+    def rollback(self, checkpoint: tuple) -> None:
+        """Drop the records after the checkpoint."""
+        self.operation_num, self.best_key_value = checkpoint
+        record_num = len(self.operation_ids)
+        while record_num > 0 and self.operation_ids[record_num - 1] >= self.operation_num:
+            record_num -= 1
+        if record_num < len(self.operation_ids):
+            self.select(range(record_num))
+
+    def copy(self) -> "TrajectoryRecorder":
+        recorder = TrajectoryRecorder(self.mode, self.sample_interval, self.max_records, self.compare)
+        recorder.operation_num = self.operation_num
+        recorder.best_key_value = self.best_key_value
+        recorder.operation_ids = array("q", self.operation_ids)
+        recorder.heuristic_ids = array("i", self.heuristic_ids)
+        recorder.heuristic_names = self.heuristic_names[:]
+        recorder.heuristic_name_to_id = self.heuristic_name_to_id.copy()
+        recorder.columns = {item: column[:] for item, column in self.columns.items()}
+        return recorder
+
+    def keys(self) -> list[str]:
+        return ["operation_id", "heuristic"] + list(self.columns.keys())
+
+    def __len__(self) -> int:
+        return len(self.operation_ids)
+
+    def __getitem__(self, index: int) -> dict:
+        record_item = {"operation_id": self.operation_ids[index], "heuristic": self.heuristic_names[self.heuristic_ids[index]]}
+        for item, column in self.columns.items():
+            record_item[item] = column[index]
+        return record_item
+
+    def __iter__(self):
+        for index in range(len(self.operation_ids)):
+            yield self[index]
+
+    def iter_rows(self, dump_records: list[str], start: int=0):
+        """Export view that yields the tab separated rows of dump_records items from the start-th record."""
+        for index in range(start, len(self.operation_ids)):
+            row = []
+            for item in dump_records:
+                if item == "operation_id":
+                    row.append(str(self.operation_ids[index]))
+                elif item == "heuristic":
+                    row.append(self.heuristic_names[self.heuristic_ids[index]])
+                elif item in self.columns:
+                    row.append(str(self.columns[item][index]))
+                else:
+                    row.append("None")
+            yield "\t".join(row)
+
+    def index_after(self, operation_id: int) -> int:
+        """Get the index of the first record after the operation id."""
+        return bisect.bisect_right(self.operation_ids, operation_id)
@@ -0,0 +1,52 @@
+import os
+from src.problems.base.env import BaseEnv
+
+
+class ResultWriter:
+    """Streaming writer for the result of a long run.
+
+    New trajectory rows are appended to trajectory_file, so each row is written once.
+    The best complete solution without trajectory is kept in best_result_file, which is rewritten only when the key value improves.
+    """
+    def __init__(
+        self,
+        env: BaseEnv,
+        dump_records: list=["operation_id", "operator", "heuristic"],
+        trajectory_file: str="trajectory.txt",
+        best_result_file: str="best_result.txt",
+    ):
+        self.env = env
+        self.dump_records = dump_records
+        self.trajectory_file = os.path.join(env.output_dir, trajectory_file)
+        self.best_result_file = best_result_file
+        self.best_key_value = None
+        self.last_operation_id = -1
+        self.header_written = False
+
+    def update(self) -> bool:
+        """Append the new trajectory rows and save the current solution if it is the best complete one. Return whether the best is updated."""
+        self.append_trajectory()
+        if not self.env.is_complete_solution:
+            return False
+        key_value = self.env.key_value
+        if self.best_key_value is not None and self.env.compare(key_value, self.best_key_value) <= 0:
+            return False
+        self.best_key_value = key_value
+        self.env.dump_result(dump_records=None, result_file=self.best_result_file)
+        return True
+
+    def append_trajectory(self) -> None:
+        recordings = self.env.recordings
+        start = recordings.index_after(self.last_operation_id)
+        if start >= len(recordings):
+            return
+        # The first write replaces the trajectory left by an earlier run in the same output dir.
+        with open(self.trajectory_file, "a" if self.header_written else "w") as file:
+            if not self.header_written:
+                # Items are fixed by the first rows, and items missing in later rows are written as None.
+                self.dump_records = [item for item in self.dump_records if item in recordings.keys()]
+                file.write("\t".join(self.dump_records) + "\n")
+                self.header_written = True
+            for row in recordings.iter_rows(self.dump_records, start):
+                file.write(row + "\n")
+        self.last_operation_id = recordings.operation_ids[-1]
@@ -0,0 +1,138 @@
+import weakref
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+
+# Shared memory blocks attached in this process by name, so arrays loaded several times share one mapping.
+# Blocks of a SharedInstanceData owner are removed and closed when the owner is released, and blocks attached by workers stay open until the worker exits.
+attached_blocks: dict[str, shared_memory.SharedMemory] = {}
+# Number of live base arrays on each block by name. Every view of them, including plain ndarray views, keeps its base array alive, so a block is in use while any of them is.
+block_array_counts: dict[str, int] = {}
+# Released blocks that are still in use. Each is closed once the last array on it is garbage collected.
+unclosed_blocks: list[shared_memory.SharedMemory] = []
+
+
+class SharedArray:
+    """Picklable handle of an array in a shared memory block, which is attached zero-copy in every process that loads it."""
+    def __init__(self, name: str, shape: tuple[int, ...], dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def attach(self) -> "SharedNDArray":
+        block = attached_blocks.get(self.name)
+        if block is None:
+            block = open_block(self.name)
+            attached_blocks[self.name] = block
+        buffer_array = np.ndarray(self.shape, dtype=self.dtype, buffer=block.buf)
+        block_array_counts[self.name] = block_array_counts.get(self.name, 0) + 1
+        weakref.finalize(buffer_array, release_block_array, self.name)
+        array = buffer_array.view(SharedNDArray)
+        # Every process maps the same memory, so writes would change the instance of all workers.
+        array.flags.writeable = False
+        array.handle = self
+        return array
+
+
+def open_block(name: str) -> shared_memory.SharedMemory:
+    """Attach an existing block without handing it to the resource tracker, so the exit of a worker never unlinks the block of its parent."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python before 3.13 always tracks attached blocks.
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+class SharedNDArray(np.ndarray):
+    """Array on a shared memory block that is pickled as its SharedArray handle instead of its content.
+    Arrays derived from it, such as rows and computation results, have no handle and are pickled by value."""
+    handle: SharedArray = None
+
+    def __array_ufunc__(self, ufunc: np.ufunc, method: str, *inputs, **kwargs) -> object:
+        # Compute on plain array views, so results are ordinary arrays and scalars instead of subclass instances, such as 0-d arrays from sum.
+        inputs = tuple(value.view(np.ndarray) if isinstance(value, SharedNDArray) else value for value in inputs)
+        if "out" in kwargs:
+            kwargs["out"] = tuple(value.view(np.ndarray) if isinstance(value, SharedNDArray) else value for value in kwargs["out"])
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __reduce_ex__(self, protocol: int) -> tuple:
+        handle = self.__dict__.get("handle")
+        if handle is None:
+            return self.view(np.ndarray).__reduce_ex__(protocol)
+        return (SharedArray.attach, (handle,))
+
+    def __reduce__(self) -> tuple:
+        return self.__reduce_ex__(2)
+
+
+def release_block_array(name: str) -> None:
+    block_array_counts[name] -= 1
+    if block_array_counts[name] == 0:
+        block_array_counts.pop(name)
+        close_unused_blocks()
+
+
+def close_unused_blocks() -> None:
+    """Close the released blocks without arrays left on them."""
+    # numpy holds no buffer export on the block, so closing a block with live arrays would unmap their memory.
+    for block in list(unclosed_blocks):
+        if block.name not in block_array_counts:
+            unclosed_blocks.remove(block)
+            block.close()
+
+
+def release_blocks(blocks: list[shared_memory.SharedMemory]) -> None:
+    """Unlink the blocks, drop them from attached_blocks and close their mapping in this process once no array uses them."""
+    for block in blocks:
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+        attached_blocks.pop(block.name, None)
+        unclosed_blocks.append(block)
+    blocks.clear()
+    close_unused_blocks()
+
+
+class SharedInstanceData:
+    """Owner of the shared memory blocks that hold the instance arrays of an env.
+
+    Arrays in instance data with at least min_nbytes bytes are copied once into shared memory and replaced by SharedNDArray views on it.
+    Array attributes of instance data objects, such as the arrays of CSRMatrix and ImplicitDistanceMatrix, are replaced in place, so bound methods of these objects keep working.
+    Pickling the env then ships small handles, and workers attach the same memory, so memory use stays flat as the number of workers grows.
+    The blocks are unlinked and closed when the owner is garbage collected or the process exits, so processes that load instances one after another do not keep the mappings of earlier ones.
+    Processes that have attached them keep their mapping until they exit.
+    """
+    def __init__(self, instance_data: dict, min_nbytes: int=1 << 20):
+        self.min_nbytes = min_nbytes
+        self.blocks: list[shared_memory.SharedMemory] = []
+        self.shared_nbytes = 0
+        for key, value in instance_data.items():
+            if isinstance(value, np.ndarray):
+                instance_data[key] = self.share(value)
+            elif hasattr(value, "__dict__"):
+                for attribute, attribute_value in list(vars(value).items()):
+                    if isinstance(attribute_value, np.ndarray):
+                        setattr(value, attribute, self.share(attribute_value))
+        self.finalizer = weakref.finalize(self, release_blocks, self.blocks)
+
+    def share(self, array: np.ndarray) -> np.ndarray:
+        if isinstance(array, SharedNDArray) and array.__dict__.get("handle") is not None:
+            return array
+        if array.nbytes < self.min_nbytes or array.dtype.hasobject:
+            return array
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.blocks.append(block)
+        attached_blocks[block.name] = block
+        shared_array = SharedArray(block.name, array.shape, array.dtype.str).attach()
+        shared_array.flags.writeable = True
+        shared_array[...] = array
+        shared_array.flags.writeable = False
+        self.shared_nbytes += array.nbytes
+        return shared_array
+
+    def close(self) -> None:
+        """Unlink and close the blocks now. Arrays in this process keep the mapping until they are released, but the env can no longer be sent to new processes."""
+        self.finalizer()
@@ -0,0 +1,160 @@
+import numpy as np
+
+
+class CSRMatrix:
+    """Square sparse matrix in compressed sparse row layout, built on numpy arrays only.
+
+    Row i holds the column indices indices[indptr[i]: indptr[i + 1]] in ascending order and their values in data.
+    It supports the dense matrix idioms used by heuristics, so code written for numpy arrays keeps working:
+        - matrix[i] returns the dense row, and the last row is cached so matrix[i][j] in a loop over j costs O(1) per access.
+        - matrix[i, j] looks up the value by binary search in row i.
+        - matrix[nodes] returns the dense rows of nodes.
+        - matrix[:, cols] returns the dense columns of cols.
+        - matrix @ vector and vector @ matrix cost O(number of nonzeros).
+    """
+    # Make numpy return NotImplemented for vector @ matrix, so that __rmatmul__ runs.
+    __array_ufunc__ = None
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, size: int):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.size = size
+        # (row index, dense row) of the last accessed row, which is replaced as a whole so that threads sharing the matrix never see a mismatched pair.
+        self.cached_row: tuple[int, np.ndarray] = None
+        self.cached_row_indices: np.ndarray = None
+
+    @classmethod
+    def from_entries(cls, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, size: int) -> "CSRMatrix":
+        """Build the matrix from entries, where the last one wins for duplicate positions and zero values are dropped."""
+        keys = np.asarray(rows, dtype=np.int64) * size + np.asarray(cols, dtype=np.int64)
+        # Unique on the reversed entries keeps the first one in reversed order, which is the last one in original order.
+        unique_keys, reversed_positions = np.unique(keys[::-1], return_index=True)
+        unique_values = np.asarray(values, dtype=float)[::-1][reversed_positions]
+        nonzero = unique_values != 0
+        unique_keys, unique_values = unique_keys[nonzero], unique_values[nonzero]
+        unique_rows = unique_keys // size
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(unique_rows, minlength=size), out=indptr[1:])
+        return cls(indptr, (unique_keys % size).astype(np.int64), unique_values, size)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.size, self.size)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def row_indices(self) -> np.ndarray:
+        """Row index of each stored value."""
+        if self.cached_row_indices is None:
+            self.cached_row_indices = np.repeat(np.arange(self.size), np.diff(self.indptr))
+        return self.cached_row_indices
+
+    def neighbors(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """Column indices and values of the nonzero entries in row."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start: end], self.data[start: end]
+
+    def get(self, row: int, col: int) -> float:
+        cols, values = self.neighbors(row)
+        position = np.searchsorted(cols, col)
+        if position < len(cols) and cols[position] == col:
+            return values[position]
+        return 0.0
+
+    def dense_row(self, row: int) -> np.ndarray:
+        cached_row = self.cached_row
+        if cached_row is None or cached_row[0] != row:
+            dense_row = np.zeros(self.size)
+            cols, values = self.neighbors(row)
+            dense_row[cols] = values
+            # The cached row is shared by callers, so it is read-only.
+            dense_row.flags.writeable = False
+            cached_row = (row, dense_row)
+            self.cached_row = cached_row
+        return cached_row[1]
+
+    def __getitem__(self, key: object) -> object:
+        is_index = lambda index: isinstance(index, (int, np.integer))
+        if isinstance(key, tuple):
+            row, col = key
+            if is_index(row) and is_index(col):
+                return self.get(int(row), int(col))
+            if is_index(row):
+                return self.dense_row(int(row))[col]
+            if is_index(col):
+                return self.dense_columns([int(col)])[row, 0]
+            return self.dense_columns(np.arange(self.size)[col])[row]
+        if is_index(key):
+            return self.dense_row(int(key))
+        rows = np.arange(self.size)[key]
+        dense_rows = np.zeros((len(rows), self.size))
+        for position, row in enumerate(rows):
+            cols, values = self.neighbors(row)
+            dense_rows[position, cols] = values
+        return dense_rows
+
+    def dense_columns(self, cols: np.ndarray) -> np.ndarray:
+        """Dense matrix with shape (size, len(cols)) of the columns cols."""
+        cols = np.asarray(cols, dtype=np.int64)
+        dense_columns = np.zeros((self.size, len(cols)))
+        if len(cols) == 0:
+            return dense_columns
+        column_positions = np.full(self.size, -1)
+        column_positions[cols] = np.arange(len(cols))
+        positions = column_positions[self.indices]
+        selected = positions >= 0
+        dense_columns[self.row_indices()[selected], positions[selected]] = self.data[selected]
+        return dense_columns
+
+    def __matmul__(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=float)
+        return np.bincount(self.row_indices(), weights=self.data * vector[self.indices], minlength=self.size)
+
+    def __rmatmul__(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=float)
+        return np.bincount(self.indices, weights=self.data * vector[self.row_indices()], minlength=self.size)
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        return self @ vector
+
+    def pattern_dot(self, vector: np.ndarray) -> np.ndarray:
+        """Product of the nonzero pattern with vector, such as the number of neighbors in a set for a 0/1 vector."""
+        vector = np.asarray(vector, dtype=float)
+        return np.bincount(self.row_indices(), weights=vector[self.indices], minlength=self.size)
+
+    def diagonal(self) -> np.ndarray:
+        rows = self.row_indices()
+        diagonal = np.zeros(self.size)
+        on_diagonal = rows == self.indices
+        diagonal[rows[on_diagonal]] = self.data[on_diagonal]
+        return diagonal
+
+    def sum(self, axis: int=None) -> object:
+        if axis is None:
+            return self.data.sum()
+        if axis == 1:
+            return np.bincount(self.row_indices(), weights=self.data, minlength=self.size)
+        return np.bincount(self.indices, weights=self.data, minlength=self.size)
+
+    def count_nonzero(self, axis: int=None) -> object:
+        if axis is None:
+            return self.nnz
+        if axis == 1:
+            return np.diff(self.indptr)
+        return np.bincount(self.indices, minlength=self.size)
+
+    def toarray(self) -> np.ndarray:
+        dense = np.zeros(self.shape)
+        dense[self.row_indices(), self.indices] = self.data
+        return dense
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["cached_row"], state["cached_row_indices"] = None, None
+        return state
@@ -10,6 +10,9 @@ class Solution(BaseSolution):
         self.routes = routes
         self.depot = depot
 
+    def canonical_hash(self) -> int:
+        return hash((self.depot, tuple(tuple(route) for route in self.routes)))
+
     def __str__(self) -> str:
         route_string = ""
         for index, route in enumerate(self.routes):
@@ -31,6 +34,12 @@ class AppendOperator(BaseOperator):
         new_routes[self.vehicle_id].append(self.node)
         return Solution(new_routes, solution.depot)
 
+    def run_inplace(self, solution: Solution) -> None:
+        solution.routes[self.vehicle_id].append(self.node)
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        solution.routes[self.vehicle_id].pop()
+
 
 class InsertOperator(BaseOperator):
     """Insert a node at a specified position within the route of a specified vehicle."""
@@ -44,6 +53,16 @@ class InsertOperator(BaseOperator):
         new_routes[self.vehicle_id].insert(self.position, self.node)
         return Solution(new_routes, solution.depot)
 
+    def run_inplace(self, solution: Solution) -> int:
+        route = solution.routes[self.vehicle_id]
+        # Same index as list.insert in run, which also accepts negative or out of range positions.
+        index = slice(self.position).indices(len(route))[1]
+        route.insert(index, self.node)
+        return index
+
+    def undo(self, solution: Solution, undo_token: int) -> None:
+        solution.routes[self.vehicle_id].pop(undo_token)
+
 
 class SwapOperator(BaseOperator):
     """Swap two nodes between or within vehicle routes."""
@@ -64,6 +83,13 @@ class SwapOperator(BaseOperator):
         new_routes[self.vehicle_id1][self.position1], new_routes[self.vehicle_id2][self.position2] = new_routes[self.vehicle_id2][self.position2], new_routes[self.vehicle_id1][self.position1]
         return Solution(new_routes, solution.depot)
 
+    def run_inplace(self, solution: Solution) -> None:
+        routes = solution.routes
+        routes[self.vehicle_id1][self.position1], routes[self.vehicle_id2][self.position2] = routes[self.vehicle_id2][self.position2], routes[self.vehicle_id1][self.position1]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
+
 
 class ReverseSegmentOperator(BaseOperator):
     """Reverse multiple segments of indices in the solution."""
@@ -92,6 +118,23 @@ class ReverseSegmentOperator(BaseOperator):
         new_routes = solution.routes[:self.vehicle_id] + [new_route] + solution.routes[self.vehicle_id + 1:]
         return Solution(new_routes, solution.depot)
 
+    def run_inplace(self, solution: Solution) -> object:
+        # Segments wrapping around the route end rebuild the route, so they go through the copying run.
+        if any(start_index > end_index for start_index, end_index in self.segments):
+            return super().run_inplace(solution)
+        route = solution.routes[self.vehicle_id]
+        assert all(0 <= start_index <= end_index < len(route) for start_index, end_index in self.segments)
+        for start_index, end_index in self.segments:
+            route[start_index:end_index + 1] = route[start_index:end_index + 1][::-1]
+        return None
+
+    def undo(self, solution: Solution, undo_token: object) -> None:
+        if undo_token is not None:
+            return super().undo(solution, undo_token)
+        route = solution.routes[self.vehicle_id]
+        for start_index, end_index in reversed(self.segments):
+            route[start_index:end_index + 1] = route[start_index:end_index + 1][::-1]
+
 
 class RelocateOperator(BaseOperator):
     """Move a node from one position in a route to another, possibly in a different route."""
@@ -113,6 +156,21 @@ class RelocateOperator(BaseOperator):
             new_routes[self.target_vehicle_id].insert(self.target_position, node)
         return Solution(new_routes, solution.depot)
 
+    def run_inplace(self, solution: Solution) -> tuple[int, int]:
+        source_route = solution.routes[self.source_vehicle_id]
+        target_route = solution.routes[self.target_vehicle_id]
+        source_index = range(len(source_route))[self.source_position]
+        assert source_route[source_index] != solution.depot
+        node = source_route.pop(source_index)
+        target_index = slice(self.target_position).indices(len(target_route))[1]
+        target_route.insert(target_index, node)
+        return source_index, target_index
+
+    def undo(self, solution: Solution, undo_token: tuple[int, int]) -> None:
+        source_index, target_index = undo_token
+        node = solution.routes[self.target_vehicle_id].pop(target_index)
+        solution.routes[self.source_vehicle_id].insert(source_index, node)
+
 
 class MergeRoutesOperator(BaseOperator):
     """Merge two routes by appending the route of the source vehicle to the beginning of the route of the target vehicle. 
@@ -132,3 +190,16 @@ class MergeRoutesOperator(BaseOperator):
         new_routes[self.target_vehicle_id] = [solution.depot] + rotated_route1 + rotated_route2
         new_routes[self.source_vehicle_id] = [solution.depot]
         return Solution(new_routes, solution.depot)
+
+    def run_inplace(self, solution: Solution) -> tuple[list[int], list[int]]:
+        source_route = solution.routes[self.source_vehicle_id]
+        target_route = solution.routes[self.target_vehicle_id]
+        depot_index1 = source_route.index(solution.depot)
+        depot_index2 = target_route.index(solution.depot)
+        merged_route = [solution.depot] + source_route[depot_index1 + 1:] + source_route[:depot_index1] + target_route[depot_index2 + 1:] + target_route[:depot_index2]
+        solution.routes[self.target_vehicle_id] = merged_route
+        solution.routes[self.source_vehicle_id] = [solution.depot]
+        return source_route, target_route
+
+    def undo(self, solution: Solution, undo_token: tuple[list[int], list[int]]) -> None:
+        solution.routes[self.target_vehicle_id], solution.routes[self.source_vehicle_id] = undo_token[1], undo_token[0]
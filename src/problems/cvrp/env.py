@@ -2,13 +2,15 @@ import os
 import tsplib95
 import numpy as np
 import pandas as pd
-import networkx as nx
 from src.problems.base.env import BaseEnv
+from src.problems.base.distance import load_tsplib_distance_matrix
 from src.problems.cvrp.components import Solution
 
 
 class Env(BaseEnv):
     """CVRP env that stores the instance data, current solution, and problem state to support algorithm."""
+    instance_data_modules: list[str] = ["src.problems.base.distance"]
+
     def __init__(self, data_name: str, **kwargs):
         super().__init__(data_name, "cvrp")
         self.construction_steps = self.instance_data["node_num"]
@@ -22,19 +24,9 @@ class Env(BaseEnv):
     def load_data(self, data_path: str) -> None:
         problem = tsplib95.load(data_path)
         depot = problem.depots[0] - 1
-        if problem.edge_weight_type == "EUC_2D":
-            node_coords = problem.node_coords
-            node_num = len(node_coords)
-            distance_matrix = np.zeros((node_num, node_num))
-            for i in range(node_num):
-                for j in range(node_num):
-                    if i != j:
-                        x1, y1 = node_coords[i + 1]
-                        x2, y2 = node_coords[j + 1]
-                        distance_matrix[i][j] = np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
-        else:
-            distance_matrix = nx.to_numpy_array(problem.get_graph())
-            node_num = len(distance_matrix)
+        # CVRP keeps the exact Euclidean distance for EUC_2D instead of the TSPLIB rounded one.
+        distance_matrix = load_tsplib_distance_matrix(problem, rounding=problem.edge_weight_type != "EUC_2D")
+        node_num = len(distance_matrix)
         if os.path.basename(data_path).split(".")[0].split("-")[-1][0] == "k":
             vehicle_num = int(os.path.basename(data_path).split(".")[0].split("-")[-1][1:])
         elif open(data_path).readlines()[-1].strip().split(" : ")[0] == "VEHICLE":
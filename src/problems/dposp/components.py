@@ -8,6 +8,9 @@ class Solution(BaseSolution):
     def __init__(self, production_schedule: list[list[int]]):
         self.production_schedule = production_schedule
 
+    def canonical_hash(self) -> int:
+        return hash(tuple(tuple(production_schedule) for production_schedule in self.production_schedule))
+
     def __str__(self) -> str:
         production_schedules_str = ""
         for index, production_schedule in enumerate(self.production_schedule):
@@ -26,6 +29,12 @@ class AppendOperator(BaseOperator):
         new_schedule[self.production_line_id].append(self.order_id)
         return Solution(new_schedule)
 
+    def run_inplace(self, solution: Solution) -> None:
+        solution.production_schedule[self.production_line_id].append(self.order_id)
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        solution.production_schedule[self.production_line_id].pop()
+
 
 class InsertOperator(BaseOperator):
     """Inserts an order at a specified position within a production line's schedule."""
@@ -39,6 +48,16 @@ class InsertOperator(BaseOperator):
         new_schedule[self.production_line_id].insert(self.position, self.order_id)
         return Solution(new_schedule)
 
+    def run_inplace(self, solution: Solution) -> int:
+        schedule = solution.production_schedule[self.production_line_id]
+        # Same index as list.insert in run, which also accepts negative or out of range positions.
+        index = slice(self.position).indices(len(schedule))[1]
+        schedule.insert(index, self.order_id)
+        return index
+
+    def undo(self, solution: Solution, undo_token: int) -> None:
+        solution.production_schedule[self.production_line_id].pop(undo_token)
+
 
 class SwapOperator(BaseOperator):
     """Swaps two orders between or within production lines."""
@@ -59,6 +78,13 @@ class SwapOperator(BaseOperator):
         new_schedule[self.production_line_id1][self.position1], new_schedule[self.production_line_id2][self.position2] = new_schedule[self.production_line_id2][self.position2], new_schedule[self.production_line_id1][self.position1]
         return Solution(new_schedule)
 
+    def run_inplace(self, solution: Solution) -> None:
+        schedule = solution.production_schedule
+        schedule[self.production_line_id1][self.position1], schedule[self.production_line_id2][self.position2] = schedule[self.production_line_id2][self.position2], schedule[self.production_line_id1][self.position1]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
+
 
 class ReverseSegmentOperator(BaseOperator):
     """Reverses a segment of orders within a production line's schedule."""
@@ -85,6 +111,19 @@ class ReverseSegmentOperator(BaseOperator):
 
         return Solution(new_schedule)
 
+    def run_inplace(self, solution: Solution) -> None:
+        schedule = solution.production_schedule[self.production_line_id]
+        assert all(0 <= start_index < len(schedule) and 0 <= end_index < len(schedule) for start_index, end_index in self.segments)
+        for start_index, end_index in self.segments:
+            start_index, end_index = min(start_index, end_index), max(start_index, end_index)
+            schedule[start_index:end_index + 1] = schedule[start_index:end_index + 1][::-1]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        schedule = solution.production_schedule[self.production_line_id]
+        for start_index, end_index in reversed(self.segments):
+            start_index, end_index = min(start_index, end_index), max(start_index, end_index)
+            schedule[start_index:end_index + 1] = schedule[start_index:end_index + 1][::-1]
+
 
 class RelocateOperator(BaseOperator):
     """Moves an order from one position to another within the same or to a different production line."""
@@ -105,6 +144,20 @@ class RelocateOperator(BaseOperator):
             new_schedule[self.target_production_line_id].insert(self.target_position, order)
         return Solution(new_schedule)
 
+    def run_inplace(self, solution: Solution) -> tuple[int, int]:
+        source_schedule = solution.production_schedule[self.source_production_line_id]
+        target_schedule = solution.production_schedule[self.target_production_line_id]
+        source_index = range(len(source_schedule))[self.source_position]
+        order = source_schedule.pop(source_index)
+        target_index = slice(self.target_position).indices(len(target_schedule))[1]
+        target_schedule.insert(target_index, order)
+        return source_index, target_index
+
+    def undo(self, solution: Solution, undo_token: tuple[int, int]) -> None:
+        source_index, target_index = undo_token
+        order = solution.production_schedule[self.target_production_line_id].pop(target_index)
+        solution.production_schedule[self.source_production_line_id].insert(source_index, order)
+
 
 class MergeOperator(BaseOperator):
     """Merges the schedule of a source production line into the beginning of a target production line's schedule. 
@@ -119,3 +172,13 @@ class MergeOperator(BaseOperator):
         new_schedule[self.target_production_line_id] = new_schedule[self.source_production_line_id] + new_schedule[self.target_production_line_id]
         new_schedule[self.source_production_line_id] = []
         return Solution(new_schedule)
+
+    def run_inplace(self, solution: Solution) -> tuple[list[int], list[int]]:
+        source_schedule = solution.production_schedule[self.source_production_line_id]
+        target_schedule = solution.production_schedule[self.target_production_line_id]
+        solution.production_schedule[self.target_production_line_id] = source_schedule + target_schedule
+        solution.production_schedule[self.source_production_line_id] = []
+        return source_schedule, target_schedule
+
+    def undo(self, solution: Solution, undo_token: tuple[list[int], list[int]]) -> None:
+        solution.production_schedule[self.target_production_line_id], solution.production_schedule[self.source_production_line_id] = undo_token[1], undo_token[0]
@@ -18,38 +18,39 @@ class Env(BaseEnv):
         return True
 
     def load_data(self, data_name: str) -> tuple:
-        production_df = pd.read_csv(os.path.join(data_name, "production.tsv"), sep="\t")
-        transition_df = pd.read_csv(os.path.join(data_name, "transition.tsv"), sep="\t")
-        order_df = pd.read_csv(os.path.join(data_name, "order.tsv"), sep="\t")
+        # Read typed columns, and parse Forbidden transition as NaN in the same pass.
+        production_df = pd.read_csv(os.path.join(data_name, "production.tsv"), sep="\t", dtype={"ProductionLine": np.int64, "Product": np.int64, "ProductionRate": float})
+        transition_df = pd.read_csv(
+            os.path.join(data_name, "transition.tsv"),
+            sep="\t",
+            dtype={"ProductionLine": np.int64, "SourceProduct": np.int64, "DestinationProduct": np.int64, "TransitionTime": float},
+            na_values={"TransitionTime": ["Forbidden"]},
+            keep_default_na=False,
+        )
+        order_df = pd.read_csv(os.path.join(data_name, "order.tsv"), sep="\t", dtype={"Product": np.int64, "Quantity": float, "Deadline": float})
 
         # Determine the number for production lines, products and orders
         production_line_num = max(production_df["ProductionLine"].max(), transition_df["ProductionLine"].max()) + 1
         product_num = max(production_df["Product"].max(), transition_df["SourceProduct"].max(), transition_df["DestinationProduct"].max(), order_df["Product"].max()) + 1
         order_num = len(order_df)
 
-        # Initialize arrays
-        production_rate = np.zeros((production_line_num, product_num))
-        transition_time = np.zeros((production_line_num, product_num, product_num))
-        order_product = np.zeros(len(order_df), dtype=int)
-        order_quantity = np.zeros(len(order_df))
-        order_deadline = np.zeros(len(order_df))
-
         # Fill production rates
-        for _, row in production_df.iterrows():
-            production_rate[row["ProductionLine"], row["Product"]] = row["ProductionRate"]
+        production_rate = np.zeros((production_line_num, product_num))
+        production_rate[production_df["ProductionLine"].to_numpy(), production_df["Product"].to_numpy()] = production_df["ProductionRate"].to_numpy()
 
-        # Fill transition times
-        for _, row in transition_df.iterrows():
-            if row["TransitionTime"] == "Forbidden":
-                transition_time[row["ProductionLine"], row["SourceProduct"], row["DestinationProduct"]] = np.inf
-            else:
-                transition_time[row["ProductionLine"], row["SourceProduct"], row["DestinationProduct"]] = row["TransitionTime"]
+        # Fill transition times, where forbidden transition is inf
+        transition_time = np.zeros((production_line_num, product_num, product_num))
+        transition_values = transition_df["TransitionTime"].to_numpy()
+        transition_time[
+            transition_df["ProductionLine"].to_numpy(),
+            transition_df["SourceProduct"].to_numpy(),
+            transition_df["DestinationProduct"].to_numpy()
+        ] = np.where(np.isnan(transition_values), np.inf, transition_values)
 
         # Fill order details
-        for i, row in order_df.iterrows():
-            order_product[i] = row["Product"]
-            order_quantity[i] = row["Quantity"]
-            order_deadline[i] = row["Deadline"]
+        order_product = order_df["Product"].to_numpy(dtype=int)
+        order_quantity = order_df["Quantity"].to_numpy(dtype=float)
+        order_deadline = order_df["Deadline"].to_numpy(dtype=float)
 
         return {"production_line_num":production_line_num, 
                 "product_num": product_num, 
@@ -72,7 +73,7 @@ class Env(BaseEnv):
         return len(set(fulfilled_orders))
 
     def helper_function(self) -> dict:
-        return {"get_problem_state": self.get_problem_state, "validation_solution": self.validation_solution, "validation_single_production_schedule": self.validation_single_production_schedule, "get_time_cost_delta": self.get_time_cost_delta}
+        return {"get_problem_state": self.get_problem_state, "validation_solution": self.validation_solution, "evaluate_operators": self.evaluate_operators, "validation_single_production_schedule": self.validation_single_production_schedule, "get_time_cost_delta": self.get_time_cost_delta}
 
     def validation_single_production_schedule(self, line_id: int, production_schedule: list[int]) -> bool:
         if production_schedule == []:
@@ -13,6 +13,10 @@ class Solution(BaseSolution):
         self.job_operation_sequence = job_operation_sequence
         self.job_operation_index = job_operation_index
 
+    def canonical_hash(self) -> int:
+        # Job operation sequence is the same for all solutions of an instance.
+        return hash((tuple(tuple(jobs) for jobs in self.job_sequences), tuple(self.job_operation_index)))
+
     def __str__(self) -> str:
         job_sequences_str = ""
         for machine_index, jobs in enumerate(self.job_sequences):
@@ -35,6 +39,16 @@ class AdvanceOperator(BaseOperator):
         job_operation_index[self.job_id] += 1
         return Solution(new_job_sequences, solution.job_operation_sequence, job_operation_index)
 
+    def run_inplace(self, solution: Solution) -> int:
+        machine_id = solution.job_operation_sequence[self.job_id][solution.job_operation_index[self.job_id]]
+        solution.job_sequences[machine_id].append(self.job_id)
+        solution.job_operation_index[self.job_id] += 1
+        return machine_id
+
+    def undo(self, solution: Solution, undo_token: int) -> None:
+        solution.job_sequences[undo_token].pop()
+        solution.job_operation_index[self.job_id] -= 1
+
 
 class SwapOperator(BaseOperator):
     """Swaps two operations in corresponding jobs in the same machine's."""
@@ -51,6 +65,15 @@ class SwapOperator(BaseOperator):
         new_job_sequences[self.machine_id][index2], new_job_sequences[self.machine_id][index1]
         return Solution(new_job_sequences, solution.job_operation_sequence, solution.job_operation_index)
 
+    def run_inplace(self, solution: Solution) -> None:
+        job_sequence = solution.job_sequences[self.machine_id]
+        index1 = job_sequence.index(self.job_id1)
+        index2 = job_sequence.index(self.job_id2)
+        job_sequence[index1], job_sequence[index2] = job_sequence[index2], job_sequence[index1]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
+
 
 class ReverseSequenceOperator(BaseOperator):
     """Reverses a sequence of operations in corresponding jobs within a machine's queue."""
@@ -65,6 +88,13 @@ class ReverseSequenceOperator(BaseOperator):
         new_job_sequences[self.machine_id][self.start_position:self.end_position+1] = sequence[::-1]
         return Solution(new_job_sequences, solution.job_operation_sequence, solution.job_operation_index)
 
+    def run_inplace(self, solution: Solution) -> None:
+        job_sequence = solution.job_sequences[self.machine_id]
+        job_sequence[self.start_position:self.end_position+1] = job_sequence[self.start_position:self.end_position+1][::-1]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
+
 
 class ShiftOperator(BaseOperator):
     """Shifts an operation to a new position within the same machine's queue."""
@@ -80,4 +110,19 @@ class ShiftOperator(BaseOperator):
         operation = new_job_sequences[self.machine_id].pop(current_position)
         # Insert the operation at the new position
         new_job_sequences[self.machine_id].insert(self.new_position, operation)
-        return Solution(new_job_sequences, solution.job_operation_sequence, solution.job_operation_index)
\ No newline at end of file
+        return Solution(new_job_sequences, solution.job_operation_sequence, solution.job_operation_index)
+
+    def run_inplace(self, solution: Solution) -> tuple[int, int]:
+        job_sequence = solution.job_sequences[self.machine_id]
+        current_position = job_sequence.index(self.job_id)
+        job_sequence.pop(current_position)
+        # Same index as list.insert in run, which also accepts negative or out of range positions.
+        new_position = slice(self.new_position).indices(len(job_sequence))[1]
+        job_sequence.insert(new_position, self.job_id)
+        return current_position, new_position
+
+    def undo(self, solution: Solution, undo_token: tuple[int, int]) -> None:
+        current_position, new_position = undo_token
+        job_sequence = solution.job_sequences[self.machine_id]
+        job_sequence.pop(new_position)
+        job_sequence.insert(current_position, self.job_id)
@@ -5,6 +5,8 @@ from src.problems.jssp.components import Solution
 
 class Env(BaseEnv):
     """JSSP env that stores the instance data, current solution, and problem state to support algorithm."""
+    # get_solution_problem_state returns None for unschedulable job sequences and heuristics check problem state against None.
+    lazy_problem_state = False
 
     def __init__(self, data_name: str, **kwargs):
         super().__init__(data_name, "jssp")
@@ -14,8 +16,15 @@ class Env(BaseEnv):
 
     @property
     def is_complete_solution(self) -> bool:
-        self.get_key_value()
-        return self.unfinished_jobs == []
+        return self.get_current_schedule()[1] == []
+
+    def get_current_schedule(self) -> tuple[float, list[int]]:
+        """Makespan and unfinished jobs of the current solution, which are simulated once per solution version."""
+        schedule_cache = getattr(self, "schedule_cache", None)
+        if schedule_cache is None or schedule_cache[0] != self.solution_version:
+            schedule_cache = (self.solution_version, self.simulate_schedule(self.current_solution))
+            self.schedule_cache = schedule_cache
+        return schedule_cache[1]
 
     def load_data(self, data_path: str) -> tuple:
         with open(data_path, "r") as file:
@@ -35,8 +44,12 @@ class Env(BaseEnv):
 
     def get_key_value(self, solution: Solution=None) -> float:
         """Get the key value of the current solution based on the key item."""
-        if solution is None:
-            solution = self.current_solution
+        if solution is None or solution is self.current_solution:
+            return self.get_current_schedule()[0]
+        return self.simulate_schedule(solution)[0]
+
+    def simulate_schedule(self, solution: Solution) -> tuple[float, list[int]]:
+        """Simulate the schedule of the solution and return the makespan and unfinished jobs, or (None, None) for unschedulable job sequences."""
         # Initialize dynamic state data
         job_operation_index = [0] * self.instance_data["job_num"]
         job_last_operation_end_times = [0] * self.instance_data["job_num"]
@@ -60,7 +73,7 @@ class Env(BaseEnv):
                         target_operation_index = job_machine_operation_index
                         break
             if target_job_id is None:
-                return None
+                return None, None
 
             start_time = max(job_last_operation_end_times[target_job_id], machine_last_operation_end_times[target_machine_id])
             end_time = start_time + self.instance_data["job_operation_time"][target_job_id, target_operation_index]
@@ -70,11 +83,11 @@ class Env(BaseEnv):
             machine_operation_index[target_machine_id] += 1
 
         current_makespan = max(machine_last_operation_end_times)
-        self.unfinished_jobs = []
+        unfinished_jobs = []
         for job_id in range(self.instance_data["job_num"]):
             if job_operation_index[job_id] != len(self.instance_data["job_operation_sequence"][job_id]):
-                self.unfinished_jobs.append(job_id)
-        return current_makespan
+                unfinished_jobs.append(job_id)
+        return current_makespan, unfinished_jobs
 
     def validation_solution(self, solution: Solution=None) -> bool:
         """Check the validation of this solution in the following items:
@@ -31,6 +31,8 @@ def _3opt_6ee0(problem_state: dict, algorithm_data: dict, **kwargs) -> tuple[Swa
     # Initialize variables to store the best swap operator and its corresponding makespan improvement
     best_operator = None
     best_improvement = 0
+    # Candidates are applied and undone on one working copy instead of copying the solution for each of them
+    working_solution = Solution([job_sequence[:] for job_sequence in current_solution.job_sequences], current_solution.job_operation_sequence, current_solution.job_operation_index[:])
     
     # Iterate over all machines
     for machine_id in range(problem_state['machine_num']):
@@ -46,16 +48,19 @@ def _3opt_6ee0(problem_state: dict, algorithm_data: dict, **kwargs) -> tuple[Swa
             for j in range(i + 1, num_jobs - 1):
                 for k in range(j + 1, num_jobs):
                     # Perform 2-opt swaps and check for improvement
-                    new_solution = SwapOperator(machine_id, job_sequence[i], job_sequence[k]).run(current_solution)
-                    new_problem_state = problem_state["get_problem_state"](new_solution)
-                    if new_problem_state == None:
+                    operator = SwapOperator(machine_id, job_sequence[i], job_sequence[k])
+                    undo_token = operator.run_inplace(working_solution)
+                    new_problem_state = problem_state["get_problem_state"](working_solution)
+                    new_makespan = None if new_problem_state is None else new_problem_state['current_makespan']
+                    operator.undo(working_solution, undo_token)
+                    if new_makespan == None:
                         continue
-                    improvement = problem_state['current_makespan'] - new_problem_state['current_makespan']
+                    improvement = problem_state['current_makespan'] - new_makespan
                     
                     # Update the best operator if this swap results in a better makespan
                     if improvement > best_improvement:
                         best_improvement = improvement
-                        best_operator = SwapOperator(machine_id, job_sequence[i], job_sequence[k])
+                        best_operator = operator
     
     # Return the best operator found (if any) and an empty dictionary as no algorithm data is updated
     return best_operator, {}
\ No newline at end of file
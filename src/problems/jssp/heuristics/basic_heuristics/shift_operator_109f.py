@@ -11,7 +11,7 @@ def shift_operator_109f(problem_state: dict, algorithm_data: dict, **kwargs) ->
             - "machine_num" (int): The total number of machines.
             - "current_solution" (Solution): The current solution state.
             - "current_makespan" (int): The current makespan of the schedule.
-        problem_state["get_problem_state"] (callable): Function to get the new state data given a Solution instance.
+        problem_state["evaluate_operators"] (callable): Function to get the makespan after each operator without modifying the current solution.
 
     Returns:
         ShiftOperator: An operator that shifts a job in the schedule to achieve a local improvement.
@@ -23,28 +23,25 @@ def shift_operator_109f(problem_state: dict, algorithm_data: dict, **kwargs) ->
     best_operator = None
     best_delta = float('inf')
 
-    # Iterate over all machines
+    # Collect the shifts of each operation to all other positions in the same machine's queue
+    operators = []
     for machine_id in range(machine_num):
-        # Iterate over all operations in the machine's queue
         for current_position, job_id in enumerate(current_solution.job_sequences[machine_id]):
-            # Try shifting the operation to all possible positions
             for new_position in range(len(current_solution.job_sequences[machine_id])):
                 # Skip if the position is the same as the current one
-                if current_position == new_position:
-                    continue
-                
-                # Create a new solution with the operation shifted to the new position
-                new_solution = ShiftOperator(machine_id, job_id, new_position).run(current_solution)
-                new_state = problem_state["get_problem_state"](new_solution)
-                
-                # If the new solution is valid, evaluate its makespan
-                if new_state is not None:
-                    delta = new_state['current_makespan'] - problem_state['current_makespan']
-                    
-                    # If the makespan is improved, store this operator
-                    if delta < best_delta:
-                        best_operator = ShiftOperator(machine_id, job_id, new_position)
-                        best_delta = delta
+                if current_position != new_position:
+                    operators.append(ShiftOperator(machine_id, job_id, new_position))
+
+    # Evaluate the makespan of all shifts at once, which is None for invalid schedules
+    new_makespans = problem_state["evaluate_operators"](operators)
+    for operator, new_makespan in zip(operators, new_makespans):
+        if new_makespan is not None:
+            delta = new_makespan - problem_state['current_makespan']
+
+            # If the makespan is improved, store this operator
+            if delta < best_delta:
+                best_operator = operator
+                best_delta = delta
 
     # If a beneficial shift is found, return the corresponding operator
     if best_operator and best_delta < 0:
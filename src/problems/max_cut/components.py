@@ -8,6 +8,10 @@ class Solution(BaseSolution):
         self.set_a = set_a
         self.set_b = set_b
 
+    def canonical_hash(self) -> int:
+        # Sets have no order, so the hash does not depend on the insertion order.
+        return hash((frozenset(self.set_a), frozenset(self.set_b)))
+
     def __str__(self) -> str:
         set_a_str = ",".join([str(i) for i in self.set_a])
         set_b_str = ",".join([str(i) for i in self.set_b])
@@ -36,6 +40,17 @@ class InsertNodeOperator(BaseOperator):
             new_set_b.add(self.node)
         return Solution(new_set_a, new_set_b)
 
+    def run_inplace(self, solution: Solution) -> bool:
+        target_set, other_set = (solution.set_a, solution.set_b) if self.target_set == "A" else (solution.set_b, solution.set_a)
+        assert self.node not in other_set
+        inserted = self.node not in target_set
+        target_set.add(self.node)
+        return inserted
+
+    def undo(self, solution: Solution, undo_token: bool) -> None:
+        if undo_token:
+            (solution.set_a if self.target_set == "A" else solution.set_b).remove(self.node)
+
 
 class InsertEdgeOperator(BaseOperator):
     """ Insert an edge into the MaxCut solution with node_1 in set A and node_2 in set B."""
@@ -52,6 +67,20 @@ class InsertEdgeOperator(BaseOperator):
         new_set_b.add(self.node_2)
         return Solution(new_set_a, new_set_b)
 
+    def run_inplace(self, solution: Solution) -> tuple[bool, bool]:
+        assert self.node_1 not in solution.set_b
+        assert self.node_2 not in solution.set_a
+        inserted = (self.node_1 not in solution.set_a, self.node_2 not in solution.set_b)
+        solution.set_a.add(self.node_1)
+        solution.set_b.add(self.node_2)
+        return inserted
+
+    def undo(self, solution: Solution, undo_token: tuple[bool, bool]) -> None:
+        if undo_token[0]:
+            solution.set_a.remove(self.node_1)
+        if undo_token[1]:
+            solution.set_b.remove(self.node_2)
+
 
 class SwapOperator(BaseOperator):
     """Swap a list of nodes from origin set to the opposite set in the MaxCut solution."""
@@ -72,6 +101,29 @@ class SwapOperator(BaseOperator):
                 new_set_a.add(node)
         return Solution(new_set_a, new_set_b)
 
+    def run_inplace(self, solution: Solution) -> list[int]:
+        swapped_nodes = []
+        for node in self.nodes:
+            if node in solution.set_a:
+                assert node not in solution.set_b
+                solution.set_a.remove(node)
+                solution.set_b.add(node)
+                swapped_nodes.append(node)
+            elif node in solution.set_b:
+                solution.set_b.remove(node)
+                solution.set_a.add(node)
+                swapped_nodes.append(node)
+        return swapped_nodes
+
+    def undo(self, solution: Solution, undo_token: list[int]) -> None:
+        for node in reversed(undo_token):
+            if node in solution.set_a:
+                solution.set_a.remove(node)
+                solution.set_b.add(node)
+            else:
+                solution.set_b.remove(node)
+                solution.set_a.add(node)
+
 
 class DeleteOperator(BaseOperator):
     """Delete a node from both sets in the MaxCut solution."""
@@ -85,4 +137,19 @@ class DeleteOperator(BaseOperator):
             new_set_a.remove(self.node)
         elif self.node in solution.set_b:
             new_set_b.remove(self.node)
-        return Solution(new_set_a, new_set_b)
\ No newline at end of file
+        return Solution(new_set_a, new_set_b)
+
+    def run_inplace(self, solution: Solution) -> str:
+        if self.node in solution.set_a:
+            solution.set_a.remove(self.node)
+            return "A"
+        elif self.node in solution.set_b:
+            solution.set_b.remove(self.node)
+            return "B"
+        return None
+
+    def undo(self, solution: Solution, undo_token: str) -> None:
+        if undo_token == "A":
+            solution.set_a.add(self.node)
+        elif undo_token == "B":
+            solution.set_b.add(self.node)
@@ -1,11 +1,18 @@
 import os
 import numpy as np
 from src.problems.base.env import BaseEnv
-from src.problems.max_cut.components import Solution
+from src.problems.base.components import BaseOperator
+from src.problems.base.sparse_matrix import CSRMatrix
+from src.problems.max_cut.components import Solution, InsertNodeOperator, SwapOperator, DeleteOperator
 
 
 class Env(BaseEnv):
     """MaxCut env that stores the instance data, current solution, and problem state to support algorithm."""
+    # Graphs with at least sparse_min_node_num nodes and edge density below sparse_density_threshold are stored as CSRMatrix instead of dense array.
+    sparse_min_node_num: int = 2000
+    sparse_density_threshold: float = 0.05
+    instance_data_modules: list[str] = ["src.problems.base.sparse_matrix"]
+
     def __init__(self, data_name: str, **kwargs):
         super().__init__(data_name, "max_cut")
         self.construction_steps = self.instance_data["node_num"]
@@ -19,12 +26,25 @@ class Env(BaseEnv):
     def load_data(self, data_path: str) -> tuple:
         with open(data_path) as file:
             node_num = int(file.readline().split(" ", 1)[0])
-            weight_matrix = np.zeros((node_num, node_num))
-            for row in file:
-                node_1, node_2, weight = [int(e) for e in row.strip("\n").split()]
-                weight_matrix[node_1 - 1][node_2 - 1] = weight
-                weight_matrix[node_2 - 1][node_1 - 1] = weight
-        return {"node_num": node_num, "weight_matrix": weight_matrix}
+            edges = np.loadtxt(file, dtype=np.int64, ndmin=2).reshape(-1, 3)
+        # Set both directions of each edge in file order, so the last one wins for duplicate edges.
+        rows = np.stack([edges[:, 0], edges[:, 1]], axis=1).ravel() - 1
+        cols = np.stack([edges[:, 1], edges[:, 0]], axis=1).ravel() - 1
+        weights = np.repeat(edges[:, 2], 2)
+        weight_matrix = CSRMatrix.from_entries(rows, cols, weights, node_num)
+        # Graph is stored by its CSR arrays, which the instance cache can save, and turned into weight matrix in load_instance_data.
+        return {"node_num": node_num, "weight_indptr": weight_matrix.indptr, "weight_indices": weight_matrix.indices, "weight_data": weight_matrix.data}
+
+    def load_instance_data(self, data_path: str) -> dict:
+        instance_data = super().load_instance_data(data_path)
+        node_num = instance_data["node_num"]
+        weight_matrix = CSRMatrix(instance_data.pop("weight_indptr"), instance_data.pop("weight_indices"), instance_data.pop("weight_data"), node_num)
+        # The sparse form is kept for get_key_value, which sums the cut edges in O(number of edges) even when the matrix is dense.
+        self.weight_edges = weight_matrix
+        if node_num < self.sparse_min_node_num or weight_matrix.nnz >= self.sparse_density_threshold * node_num * (node_num - 1):
+            weight_matrix = weight_matrix.toarray()
+        instance_data["weight_matrix"] = weight_matrix
+        return instance_data
 
     def init_solution(self) -> Solution:
         return Solution(set_a=set(), set_b=set())
@@ -33,11 +53,16 @@ class Env(BaseEnv):
         """Get the key value of the current solution based on the key item."""
         if solution is None:
             solution = self.current_solution
-        current_cut_value = 0
-        for node_a in solution.set_a:
-            for node_b in solution.set_b:
-                current_cut_value += self.instance_data["weight_matrix"][node_a][node_b]
-        return current_cut_value
+        if not solution.set_a or not solution.set_b:
+            return 0
+        # Cut value is the weight of the stored edges from set A to set B. Each edge is stored in both directions, so it is counted once.
+        node_num = self.instance_data["node_num"]
+        in_set_a = np.zeros(node_num, dtype=bool)
+        in_set_a[list(solution.set_a)] = True
+        in_set_b = np.zeros(node_num, dtype=bool)
+        in_set_b[list(solution.set_b)] = True
+        weight_edges = self.weight_edges
+        return weight_edges.data[in_set_a[weight_edges.row_indices()] & in_set_b[weight_edges.indices]].sum()
 
     def validation_solution(self, solution: Solution=None) -> bool:
         """Check the validation of this solution in the following items:
@@ -55,3 +80,51 @@ class Env(BaseEnv):
             return False
 
         return True
+
+    def evaluate_operators_in_batch(self, operators: list[BaseOperator]) -> dict[int, float]:
+        """Evaluate insert node, single node swap and delete operators by the cut weight delta of the moved node."""
+        node_num = self.instance_data["node_num"]
+        weight_matrix = self.instance_data["weight_matrix"]
+        in_set_a = np.zeros(node_num, dtype=bool)
+        in_set_a[list(self.current_solution.set_a)] = True
+        in_set_b = np.zeros(node_num, dtype=bool)
+        in_set_b[list(self.current_solution.set_b)] = True
+        current_cut_value = self.key_value
+
+        # Only the moved node changes its cut edges: the node in set A cuts edges to set B and vice versa.
+        batch_indices, nodes, old_sets, new_sets = [], [], [], []
+        for index, operator in enumerate(operators):
+            if isinstance(operator, (InsertNodeOperator, DeleteOperator)):
+                node = operator.node
+            elif isinstance(operator, SwapOperator) and len(operator.nodes) == 1:
+                node = operator.nodes[0]
+            else:
+                continue
+            if not 0 <= node < node_num:
+                continue
+            old_set = "A" if in_set_a[node] else ("B" if in_set_b[node] else None)
+            if isinstance(operator, InsertNodeOperator):
+                # Inserting the node of the other set fails in run.
+                if old_set not in [None, operator.target_set]:
+                    continue
+                new_set = operator.target_set
+            elif isinstance(operator, SwapOperator):
+                new_set = {"A": "B", "B": "A", None: None}[old_set]
+            else:
+                new_set = None
+            batch_indices.append(index)
+            nodes.append(node)
+            old_sets.append(old_set)
+            new_sets.append(new_set)
+        if not batch_indices:
+            return {}
+        nodes = np.array(nodes)
+        node_weights = weight_matrix[nodes].copy()
+        node_weights[np.arange(len(nodes)), nodes] = 0
+        # Cut weight between the node and set A / set B.
+        cut_a = node_weights @ in_set_a
+        cut_b = node_weights @ in_set_b
+        old_sets, new_sets = np.array(old_sets), np.array(new_sets)
+        costs = current_cut_value + ((new_sets == "A").astype(float) - (old_sets == "A")) * cut_b + ((new_sets == "B").astype(float) - (old_sets == "B")) * cut_a
+        return dict(zip(batch_indices, costs.tolist()))
+
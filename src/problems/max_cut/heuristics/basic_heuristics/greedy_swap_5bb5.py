@@ -1,4 +1,5 @@
 from src.problems.max_cut.components import Solution, SwapOperator
+import numpy as np
 
 def greedy_swap_5bb5(problem_state: dict, algorithm_data: dict, **kwargs) -> tuple[SwapOperator, dict]:
     """
@@ -25,8 +26,12 @@ def greedy_swap_5bb5(problem_state: dict, algorithm_data: dict, **kwargs) -> tup
     best_node = None
 
     # Precompute the sum of weights to and from each node to sets A and B
-    weight_to_a = weight_matrix[:, list(current_solution.set_a)].sum(axis=1)
-    weight_to_b = weight_matrix[:, list(current_solution.set_b)].sum(axis=1)
+    in_set_a = np.zeros(len(weight_matrix))
+    in_set_a[list(current_solution.set_a)] = 1
+    in_set_b = np.zeros(len(weight_matrix))
+    in_set_b[list(current_solution.set_b)] = 1
+    weight_to_a = weight_matrix @ in_set_a
+    weight_to_b = weight_matrix @ in_set_b
 
     # Evaluate all possible swaps to find the best one
     for node in range(len(weight_matrix)):
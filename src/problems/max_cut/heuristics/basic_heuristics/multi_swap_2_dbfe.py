@@ -1,4 +1,5 @@
 from src.problems.max_cut.components import *
+import numpy as np
 
 def multi_swap_2_dbfe(problem_state: dict, algorithm_data: dict, **kwargs) -> tuple[SwapOperator, dict]:
     """
@@ -26,8 +27,12 @@ def multi_swap_2_dbfe(problem_state: dict, algorithm_data: dict, **kwargs) -> tu
     set_b = current_solution.set_b
 
     # Precompute the sum of weights to and from each node
-    weight_to_a = weight_matrix[:, list(set_a)].sum(axis=1)
-    weight_to_b = weight_matrix[:, list(set_b)].sum(axis=1)
+    in_set_a = np.zeros(len(weight_matrix))
+    in_set_a[list(set_a)] = 1
+    in_set_b = np.zeros(len(weight_matrix))
+    in_set_b[list(set_b)] = 1
+    weight_to_a = weight_matrix @ in_set_a
+    weight_to_b = weight_matrix @ in_set_b
 
     for i in set_a:
         for j in set_b:
@@ -13,7 +13,7 @@ def simulated_annealing_ed14(problem_state: dict, algorithm_data: dict, **kwargs
             - "total_nodes" (int): The total number of vertices in the graph.
             - "current_solution" (Solution): The current solution of the Max Cut problem.
             - "current_cut_value" (int or float): The total weight of edges between set A and set B in the current solution.
-            - get_problem_state (callable): def validation_solution(solution: Solution) -> bool: The function to get the problem state for given solution without modify it.
+            - evaluate_operators (callable): def evaluate_operators(operators: list[Operator]) -> list[float]: The function to get the cut value after each operator without modifying the current solution.
         algorithm_data (dict): Contains the data specific to the simulated annealing algorithm.
             - "temperature" (float): The current temperature for the simulated annealing process.
             - "cooling_rate" (float): The rate at which the temperature decreases.
@@ -46,19 +46,13 @@ def simulated_annealing_ed14(problem_state: dict, algorithm_data: dict, **kwargs
     # Select a random node to swap
     node = random.randint(0, problem_state['node_num'] - 1)
 
-    # Create a new solution with the node swapped
-    new_solution = SwapOperator([node]).run(current_solution)
-
-    # Get the state data for the new solution
-    new_problem_state = problem_state["get_problem_state"](new_solution)
+    # Calculate the new cut value with the node swapped
+    new_cut_value = problem_state["evaluate_operators"]([SwapOperator([node])])[0]
 
     # If the new solution is invalid, return no operation
-    if new_problem_state is None:
+    if new_cut_value is None:
         return None, {}
 
-    # Calculate the new cut value
-    new_cut_value = new_problem_state['current_cut_value']
-
     # Calculate the change in cut value
     delta = new_cut_value - current_cut_value
 
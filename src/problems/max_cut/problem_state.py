@@ -21,21 +21,28 @@ def get_instance_problem_state(instance_data: dict) -> dict:
     node_num = instance_data["node_num"]
     weight_matrix = instance_data["weight_matrix"]
 
-    # Ensure the weight matrix is a numpy array
-    weight_matrix = np.array(weight_matrix)
-    
+    # Get the nonzero edge weights and node degrees from dense array or sparse CSRMatrix
+    if isinstance(weight_matrix, np.ndarray):
+        edge_weights = weight_matrix[weight_matrix.nonzero()]
+        node_degrees = np.count_nonzero(weight_matrix, axis=0)
+        max_edge_weight = np.max(weight_matrix)
+    else:
+        edge_weights = weight_matrix.data
+        node_degrees = weight_matrix.count_nonzero(axis=0)
+        # Entries not stored in sparse matrix are 0.
+        max_edge_weight = max(np.max(edge_weights), 0) if weight_matrix.nnz < node_num * node_num else np.max(edge_weights)
+
     # Calculate the number of edges and the sum of edge weights
-    nonzero_edges = np.count_nonzero(weight_matrix)
-    total_edge_weight = np.sum(weight_matrix)
+    nonzero_edges = len(edge_weights)
+    total_edge_weight = np.sum(edge_weights)
 
     # Calculate problem_states
-    average_node_degree = np.mean(np.count_nonzero(weight_matrix, axis=0))
+    average_node_degree = np.mean(node_degrees)
     edge_density = nonzero_edges / (node_num * (node_num - 1))
     average_edge_weight = total_edge_weight / nonzero_edges
-    max_edge_weight = np.max(weight_matrix)
-    min_edge_weight = np.min(weight_matrix[weight_matrix.nonzero()])
-    standard_deviation_edge_weight = np.std(weight_matrix[weight_matrix.nonzero()])
-    weighted_degree_distribution = np.sum(weight_matrix, axis=0)
+    min_edge_weight = np.min(edge_weights)
+    standard_deviation_edge_weight = np.std(edge_weights)
+    weighted_degree_distribution = weight_matrix.sum(axis=0)
 
     # Construct the feature dictionary
     problem_states = {
@@ -81,21 +88,46 @@ def get_solution_problem_state(instance_data: dict, solution: Solution) -> dict:
     selected_nodes = solution.set_a.union(solution.set_b)
     unselected_nodes = set(range(node_num)) - solution.set_a - solution.set_b
 
+    # Set membership vectors, so the sums over node pairs are matrix vector products, which cost O(edges) for sparse weight matrix.
+    in_set_a = np.zeros(node_num)
+    in_set_a[list(solution.set_a)] = 1
+    in_set_b = np.zeros(node_num)
+    in_set_b[list(solution.set_b)] = 1
+    weight_to_a = weight_matrix @ in_set_a
+    weight_to_b = weight_matrix @ in_set_b
+
     # Calculate problem states
-    current_cut_value = 0
-    for node_a in solution.set_a:
-        for node_b in solution.set_b:
-            current_cut_value += instance_data["weight_matrix"][node_a][node_b]
+    current_cut_value = in_set_a @ weight_to_b if set_a_count > 0 and set_b_count > 0 else 0
     imbalance_ratio = abs(set_a_count - set_b_count) / node_num
     average_cut_edge_weight = current_cut_value / len(selected_nodes) if selected_nodes else 0
     selected_nodes_ratio = len(selected_nodes) / node_num
     unselected_nodes_ratio = len(unselected_nodes) / node_num
-    internal_edges = [weight_matrix[i][j] for i in current_solution.set_a for j in current_solution.set_a if i != j] + \
-                     [weight_matrix[i][j] for i in current_solution.set_b for j in current_solution.set_b if i != j]
-    edge_weight_variance_within_sets = np.var(internal_edges) if internal_edges else 0
-    
+    # Variance of the weights of ordered node pairs inside set A and inside set B, including the pairs without edge
+    internal_pair_num = set_a_count * (set_a_count - 1) + set_b_count * (set_b_count - 1)
+    if internal_pair_num > 0:
+        if isinstance(weight_matrix, np.ndarray):
+            diagonal = np.diagonal(weight_matrix)
+            squared_weight_to_a = (weight_matrix ** 2) @ in_set_a
+            squared_weight_to_b = (weight_matrix ** 2) @ in_set_b
+        else:
+            diagonal = weight_matrix.diagonal()
+            squared_weight_matrix = weight_matrix.__class__(weight_matrix.indptr, weight_matrix.indices, weight_matrix.data ** 2, weight_matrix.size)
+            squared_weight_to_a = squared_weight_matrix @ in_set_a
+            squared_weight_to_b = squared_weight_matrix @ in_set_b
+        internal_weight_sum = in_set_a @ (weight_to_a - diagonal) + in_set_b @ (weight_to_b - diagonal)
+        internal_squared_weight_sum = in_set_a @ (squared_weight_to_a - diagonal ** 2) + in_set_b @ (squared_weight_to_b - diagonal ** 2)
+        internal_weight_mean = internal_weight_sum / internal_pair_num
+        edge_weight_variance_within_sets = max(internal_squared_weight_sum / internal_pair_num - internal_weight_mean ** 2, 0)
+    else:
+        edge_weight_variance_within_sets = 0
+
     # Calculate boundary nodes (nodes in selected_nodes that have an edge to unselected_nodes)
-    boundary_nodes = len([node for node in selected_nodes if any(neighbor in unselected_nodes for neighbor in np.nonzero(weight_matrix[node])[0])])
+    is_unselected = 1 - in_set_a - in_set_b
+    if isinstance(weight_matrix, np.ndarray):
+        unselected_neighbor_num = (weight_matrix != 0) @ is_unselected
+    else:
+        unselected_neighbor_num = weight_matrix.pattern_dot(is_unselected)
+    boundary_nodes = int(np.count_nonzero((unselected_neighbor_num > 0) & (is_unselected == 0)))
     boundary_node_ratio = boundary_nodes / node_num
 
     # Construct the feature dictionary
@@ -7,6 +7,9 @@ class Solution(BaseSolution):
     def __init__(self, item_inclusion: list[bool]):
         self.item_inclusion = item_inclusion
 
+    def canonical_hash(self) -> int:
+        return hash(tuple(bool(included) for included in self.item_inclusion))
+
     def __str__(self) -> str:
         included_items = [str(item) for item, included in enumerate(self.item_inclusion) if included]
         return "selected_items: " + ",".join(included_items)
@@ -22,6 +25,12 @@ class ToggleOperator(BaseOperator):
         new_item_inclusion[self.item_index] = not new_item_inclusion[self.item_index]
         return Solution(new_item_inclusion)
 
+    def run_inplace(self, solution: Solution) -> None:
+        solution.item_inclusion[self.item_index] = not solution.item_inclusion[self.item_index]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
+
 class AddOperator(BaseOperator):
     """Include an item in the knapsack."""
     def __init__(self, item_index: int):
@@ -32,6 +41,14 @@ class AddOperator(BaseOperator):
         new_item_inclusion[self.item_index] = True
         return Solution(new_item_inclusion)
 
+    def run_inplace(self, solution: Solution) -> bool:
+        previous_inclusion = solution.item_inclusion[self.item_index]
+        solution.item_inclusion[self.item_index] = True
+        return previous_inclusion
+
+    def undo(self, solution: Solution, undo_token: bool) -> None:
+        solution.item_inclusion[self.item_index] = undo_token
+
 class RemoveOperator(BaseOperator):
     """Exclude an item from the knapsack."""
     def __init__(self, item_index: int):
@@ -42,6 +59,14 @@ class RemoveOperator(BaseOperator):
         new_item_inclusion[self.item_index] = False
         return Solution(new_item_inclusion)
 
+    def run_inplace(self, solution: Solution) -> bool:
+        previous_inclusion = solution.item_inclusion[self.item_index]
+        solution.item_inclusion[self.item_index] = False
+        return previous_inclusion
+
+    def undo(self, solution: Solution, undo_token: bool) -> None:
+        solution.item_inclusion[self.item_index] = undo_token
+
 class SwapOperator(BaseOperator):
     """Swap the inclusion status of two items."""
     def __init__(self, item_index1: int, item_index2: int):
@@ -54,6 +79,13 @@ class SwapOperator(BaseOperator):
         new_item_inclusion[self.item_index2], new_item_inclusion[self.item_index1]
         return Solution(new_item_inclusion)
 
+    def run_inplace(self, solution: Solution) -> None:
+        item_inclusion = solution.item_inclusion
+        item_inclusion[self.item_index1], item_inclusion[self.item_index2] = item_inclusion[self.item_index2], item_inclusion[self.item_index1]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
+
 class FlipBlockOperator(BaseOperator):
     """Flip the a list of items."""
     def __init__(self, index_list: list[int]):
@@ -64,3 +96,10 @@ class FlipBlockOperator(BaseOperator):
         for i in self.index_list:
             new_item_inclusion[i] = not new_item_inclusion[i]
         return Solution(new_item_inclusion)
+
+    def run_inplace(self, solution: Solution) -> None:
+        for i in self.index_list:
+            solution.item_inclusion[i] = not solution.item_inclusion[i]
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        self.run_inplace(solution)
@@ -1,6 +1,7 @@
 import numpy as np
 from src.problems.base.env import BaseEnv
-from src.problems.mkp.components import Solution
+from src.problems.base.components import BaseOperator
+from src.problems.mkp.components import Solution, ToggleOperator, AddOperator, RemoveOperator, SwapOperator, FlipBlockOperator
 
 class Env(BaseEnv):
     """MKP env that stores the instance data, current solution, and problem state to support algorithm."""
@@ -61,3 +62,39 @@ class Env(BaseEnv):
             return False
 
         return True
+
+    def evaluate_operators_in_batch(self, operators: list[BaseOperator]) -> dict[int, float]:
+        """Evaluate toggle, add, remove, swap and flip block operators by the profit delta of the changed items."""
+        item_num = self.instance_data["item_num"]
+        profits = self.instance_data["profits"]
+        item_inclusion = np.array(self.current_solution.item_inclusion, dtype=bool)
+        current_profit = self.key_value
+        is_item = lambda item_index: -item_num <= item_index < item_num
+        results = {}
+
+        single_item_indices = [index for index, operator in enumerate(operators) if isinstance(operator, (ToggleOperator, AddOperator, RemoveOperator)) and is_item(operator.item_index)]
+        if single_item_indices:
+            item_indices = np.array([operators[index].item_index for index in single_item_indices])
+            included = item_inclusion[item_indices]
+            new_included = np.array([
+                not item_inclusion[operators[index].item_index] if isinstance(operators[index], ToggleOperator) else isinstance(operators[index], AddOperator)
+                for index in single_item_indices
+            ], dtype=bool)
+            costs = current_profit + (new_included.astype(float) - included) * profits[item_indices]
+            results.update(zip(single_item_indices, costs.tolist()))
+
+        swap_indices = [index for index, operator in enumerate(operators) if isinstance(operator, SwapOperator) and is_item(operator.item_index1) and is_item(operator.item_index2)]
+        if swap_indices:
+            item_indices1 = np.array([operators[index].item_index1 for index in swap_indices])
+            item_indices2 = np.array([operators[index].item_index2 for index in swap_indices])
+            inclusion_delta = item_inclusion[item_indices2].astype(float) - item_inclusion[item_indices1]
+            costs = current_profit + inclusion_delta * (profits[item_indices1] - profits[item_indices2])
+            results.update(zip(swap_indices, costs.tolist()))
+
+        for index, operator in enumerate(operators):
+            # Items flipped twice keep their inclusion, so only blocks with distinct items are evaluated here.
+            if isinstance(operator, FlipBlockOperator) and all(is_item(item_index) for item_index in operator.index_list) and len({item_index % item_num for item_index in operator.index_list}) == len(operator.index_list):
+                item_indices = np.array(operator.index_list, dtype=int)
+                results[index] = float(current_profit + np.where(item_inclusion[item_indices], -profits[item_indices], profits[item_indices]).sum())
+        return results
+
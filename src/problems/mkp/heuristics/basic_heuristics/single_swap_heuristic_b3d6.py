@@ -16,7 +16,8 @@ def single_swap_heuristic_b3d6(problem_state: dict, algorithm_data: dict, **kwar
             - "items_in_knapsack" (list[int]): Indices of items currently in the knapsack.
             - "items_not_in_knapsack" (list[int]): Indices of items currently not in the knapsack.
             - "remaining_capacity" (numpy.array): The remaining capacity for each resource dimension after considering the items included in the current solution.
-            - get_problem_state (callable): def validation_solution(solution: Solution) -> bool: The function to get the problem state for given solution without modify it.
+            - validation_solution (callable): def validation_solution(solution: Solution) -> bool: The function to check whether the solution is valid.
+            - evaluate_operators (callable): def evaluate_operators(operators: list[Operator]) -> list[float]: The function to get the profit after each operator without modifying the current solution.
         algorithm_data (dict): Not used in this heuristic.
 
     Returns:
@@ -39,25 +40,19 @@ def single_swap_heuristic_b3d6(problem_state: dict, algorithm_data: dict, **kwar
     validation_solution = problem_state["validation_solution"]
 
 
-    # Iterate over all pairs of items (one in the knapsack and one not in the knapsack)
-    for item_in in items_in_knapsack:
-        for item_out in items_not_in_knapsack:
-            # Create a potential new solution with the swap
-            new_solution = current_solution.item_inclusion[:]
-            new_solution[item_in], new_solution[item_out] = new_solution[item_out], new_solution[item_in]
-            
-            # Get the state data for the new solution
-            if validation_solution(Solution(new_solution)):
-                new_problem_state = problem_state["get_problem_state"](Solution(new_solution))
-                if new_problem_state:
-                    # Calculate the profit increase for this swap
-                    new_profit = new_problem_state["current_profit"]
-                    profit_increase = new_profit - current_profit
+    # Evaluate the profit of all swaps between one item in the knapsack and one not in the knapsack at once
+    swap_operators = [SwapOperator(item_in, item_out) for item_in in items_in_knapsack for item_out in items_not_in_knapsack]
+    new_profits = problem_state["evaluate_operators"](swap_operators)
+    for swap_operator, new_profit in zip(swap_operators, new_profits):
+        if new_profit is None:
+            continue
+        # Calculate the profit increase for this swap
+        profit_increase = new_profit - current_profit
 
-                    # Check if this swap is the best so far and update if necessary
-                    if profit_increase > best_profit_increase and all(new <= cap for new, cap in zip(new_problem_state["current_weights"], capacities)):
-                        best_profit_increase = profit_increase
-                        best_swap_operator = SwapOperator(item_in, item_out)
+        # Check if this swap is the best so far and only validate the resource constraints for the better swap
+        if profit_increase > best_profit_increase and validation_solution(swap_operator.run(current_solution)):
+            best_profit_increase = profit_increase
+            best_swap_operator = swap_operator
 
     # If a valid swap that improves the profit was found, return the corresponding SwapOperator
     if best_swap_operator is not None:
@@ -8,6 +8,9 @@ class Solution(BaseSolution):
     def __init__(self, tour: list[int]):
         self.tour = tour
 
+    def canonical_hash(self) -> int:
+        return hash(tuple(self.tour))
+
     def __str__(self) -> str:
         if len(self.tour) > 0:
             return "tour: " + "->".join(map(str, self.tour + [self.tour[0]]))
@@ -23,6 +26,12 @@ class AppendOperator(BaseOperator):
         new_tour = solution.tour + [self.node]
         return Solution(new_tour)
 
+    def run_inplace(self, solution: Solution) -> None:
+        solution.tour.append(self.node)
+
+    def undo(self, solution: Solution, undo_token: None) -> None:
+        solution.tour.pop()
+
 
 class InsertOperator(BaseOperator):
     """Insert the node into the solution at the target position."""
@@ -34,6 +43,15 @@ class InsertOperator(BaseOperator):
         new_tour = solution.tour[:self.position] + [self.node] + solution.tour[self.position:]
         return Solution(new_tour)
 
+    def run_inplace(self, solution: Solution) -> int:
+        # Same index as the slicing in run, which also accepts negative or out of range positions.
+        index = slice(self.position).indices(len(solution.tour))[1]
+        solution.tour.insert(index, self.node)
+        return index
+
+    def undo(self, solution: Solution, undo_token: int) -> None:
+        solution.tour.pop(undo_token)
+
 
 class SwapOperator(BaseOperator):
     """Swap two nodes in the solution. swap_node_pairs is a list of tuples, each containing the two nodes to swap."""
@@ -51,6 +69,17 @@ class SwapOperator(BaseOperator):
             new_tour[index_a], new_tour[index_b] = new_tour[index_b], new_tour[index_a]
         return Solution(new_tour)
 
+    def run_inplace(self, solution: Solution) -> list[tuple[int, int]]:
+        # Indices are located in the original tour as run does.
+        index_pairs = [(solution.tour.index(node_a), solution.tour.index(node_b)) for node_a, node_b in self.swap_node_pairs]
+        for index_a, index_b in index_pairs:
+            solution.tour[index_a], solution.tour[index_b] = solution.tour[index_b], solution.tour[index_a]
+        return index_pairs
+
+    def undo(self, solution: Solution, undo_token: list[tuple[int, int]]) -> None:
+        for index_a, index_b in reversed(undo_token):
+            solution.tour[index_a], solution.tour[index_b] = solution.tour[index_b], solution.tour[index_a]
+
 
 class ReplaceOperator(BaseOperator):
     """Replace a node with another one in the solution."""
@@ -63,6 +92,14 @@ class ReplaceOperator(BaseOperator):
         new_tour = solution.tour[:index] + [self.new_node] + solution.tour[index + 1:]
         return Solution(new_tour)
 
+    def run_inplace(self, solution: Solution) -> int:
+        index = solution.tour.index(self.node)
+        solution.tour[index] = self.new_node
+        return index
+
+    def undo(self, solution: Solution, undo_token: int) -> None:
+        solution.tour[undo_token] = self.node
+
 
 class ReverseSegmentOperator(BaseOperator):
     """Reverse multiple segments of indices in the solution."""
@@ -86,4 +123,19 @@ class ReverseSegmentOperator(BaseOperator):
                 # Reverse the segment outside start_index and end_index (inclusive)
                 new_tour = list(reversed(new_tour[start_index:])) + new_tour[end_index + 1:start_index] + list(reversed(new_tour[:end_index + 1]))
 
-        return Solution(new_tour)  
\ No newline at end of file
+        return Solution(new_tour)
+
+    def run_inplace(self, solution: Solution) -> object:
+        # Segments wrapping around the tour end rebuild the tour, so they go through the copying run.
+        if any(start_index > end_index for start_index, end_index in self.segments):
+            return super().run_inplace(solution)
+        assert all(0 <= start_index <= end_index < len(solution.tour) for start_index, end_index in self.segments)
+        for start_index, end_index in self.segments:
+            solution.tour[start_index:end_index + 1] = solution.tour[start_index:end_index + 1][::-1]
+        return None
+
+    def undo(self, solution: Solution, undo_token: object) -> None:
+        if undo_token is not None:
+            return super().undo(solution, undo_token)
+        for start_index, end_index in reversed(self.segments):
+            solution.tour[start_index:end_index + 1] = solution.tour[start_index:end_index + 1][::-1]
@@ -1,28 +1,63 @@
 import numpy as np
-import networkx as nx
 import tsplib95
 from src.problems.base.env import BaseEnv
-from src.problems.tsp.components import Solution
+from src.problems.base.distance import coordinate_edge_weight_types, load_tsplib_distance_matrix, compute_neighbor_lists, ImplicitDistanceMatrix
+from src.problems.base.components import BaseOperator
+from src.problems.tsp.components import Solution, AppendOperator, SwapOperator, ReverseSegmentOperator
 
 
 class Env(BaseEnv):
     """TSP env that stores the instance data, current solution, and problem state to support algorithm."""
+    # Coordinate instances with at least implicit_distance_min_node_num nodes keep only the coordinates, and distances are computed on demand by ImplicitDistanceMatrix.
+    # Their instance data also holds the neighbor_num nearest neighbors of each node as candidate lists.
+    implicit_distance_min_node_num: int = 20000
+    neighbor_num: int = 10
+    instance_data_modules: list[str] = ["src.problems.base.distance"]
+
     def __init__(self, data_name: str, **kwargs):
         super().__init__(data_name, "tsp")
         self.construction_steps = self.instance_data["node_num"]
         self.key_item = "current_cost"
         self.compare = lambda x, y: y - x
+        # Reversing a segment only changes its 2 boundary edges when the distance is symmetric.
+        distance_matrix = self.instance_data["distance_matrix"]
+        self.symmetric_distance = isinstance(distance_matrix, ImplicitDistanceMatrix) or bool(np.allclose(distance_matrix, distance_matrix.T))
+        # Holds the nearest neighbor distances of estimate_key_value once computed. Forks share the dict, so rollouts from one worker env compute them once.
+        self.nearest_distance_cache: dict = {}
 
     @property
     def is_complete_solution(self) -> bool:
         return len(set(self.current_solution.tour)) == self.instance_data["node_num"]
 
-    def load_data(self, data_path: str) -> None:
+    def load_data(self, data_path: str) -> dict:
         problem = tsplib95.load(data_path)
-        distance_matrix = nx.to_numpy_array(problem.get_graph())
+        if problem.edge_weight_type in coordinate_edge_weight_types and len(problem.node_coords) >= self.implicit_distance_min_node_num:
+            node_ids = sorted(problem.node_coords)
+            coordinates = np.array([problem.node_coords[node_id] for node_id in node_ids], dtype=float)
+            neighbor_lists = compute_neighbor_lists(coordinates, self.neighbor_num, problem.edge_weight_type)
+            # Statistics of all distances are computed here, so they are saved in the instance cache with the coordinates.
+            distance_statistics = ImplicitDistanceMatrix(coordinates, problem.edge_weight_type).statistics()
+            return {"node_num": len(node_ids), "coordinates": coordinates, "edge_weight_type": problem.edge_weight_type, "neighbor_lists": neighbor_lists, "distance_statistics": distance_statistics}
+        distance_matrix = load_tsplib_distance_matrix(problem)
         node_num = len(distance_matrix)
         return {"node_num": node_num, "distance_matrix": distance_matrix}
 
+    def load_instance_data(self, data_path: str) -> dict:
+        instance_data = super().load_instance_data(data_path)
+        if "coordinates" not in instance_data:
+            return instance_data
+        distance_matrix = ImplicitDistanceMatrix(instance_data["coordinates"], instance_data["edge_weight_type"], statistics=instance_data["distance_statistics"])
+        return {
+            "node_num": instance_data["node_num"],
+            "distance_matrix": distance_matrix,
+            "distance": distance_matrix.distance,
+            "neighbor_lists": instance_data["neighbor_lists"],
+            "coordinates": instance_data["coordinates"],
+        }
+
+    def get_instance_cache_salt(self) -> str:
+        return super().get_instance_cache_salt() + f"{self.implicit_distance_min_node_num},{self.neighbor_num}"
+
     def init_solution(self) -> None:
         return Solution(tour=[])
 
@@ -30,10 +65,34 @@ class Env(BaseEnv):
         """Get the key value of the current solution based on the key item."""
         if solution is None:
             solution = self.current_solution
-        current_cost = sum([self.instance_data["distance_matrix"][solution.tour[index]][solution.tour[index + 1]] for index in range(len(solution.tour) - 1)])
-        if len(solution.tour) > 0:
-            current_cost += self.instance_data["distance_matrix"][solution.tour[-1]][solution.tour[0]]
-        return current_cost
+        if len(solution.tour) == 0:
+            return 0
+        # Sum all edges including the closing one in one vectorized lookup, which also works for implicit distance matrix.
+        tour = np.array(solution.tour)
+        return np.sum(self.instance_data["distance_matrix"][tour, np.roll(tour, -1)])
+
+    def estimate_key_value(self) -> float:
+        """Estimate the cost of a complete tour as the cost of the current closed tour plus the nearest neighbor distance of each unvisited node."""
+        unvisited = np.ones(self.instance_data["node_num"], dtype=bool)
+        unvisited[self.current_solution.tour] = False
+        return float(self.key_value + self.get_nearest_distances()[unvisited].sum())
+
+    def get_nearest_distances(self, block_size: int=256) -> np.ndarray:
+        """Distance from each node to its nearest other node, computed on first use with the temporary memory of one row block."""
+        if "nearest_distances" not in self.nearest_distance_cache:
+            distance_matrix = self.instance_data["distance_matrix"]
+            node_num = self.instance_data["node_num"]
+            if isinstance(distance_matrix, ImplicitDistanceMatrix):
+                nearest_distances = distance_matrix.distance(np.arange(node_num), self.instance_data["neighbor_lists"][:, 0])
+            else:
+                nearest_distances = np.empty(node_num)
+                for start in range(0, node_num, block_size):
+                    end = min(start + block_size, node_num)
+                    distances = np.array(distance_matrix[start: end], dtype=float)
+                    distances[np.arange(end - start), np.arange(start, end)] = np.inf
+                    nearest_distances[start: end] = distances.min(axis=1)
+            self.nearest_distance_cache["nearest_distances"] = nearest_distances
+        return self.nearest_distance_cache["nearest_distances"]
 
     def validation_solution(self, solution: Solution=None) -> bool:
         """
@@ -65,3 +124,66 @@ class Env(BaseEnv):
                     if self.instance_data["distance_matrix"][node][next_node] == np.inf:
                         return False
         return True
+
+    def evaluate_operators_in_batch(self, operators: list[BaseOperator]) -> dict[int, float]:
+        """Evaluate append, single pair swap and single segment reverse operators by the cost delta of the changed edges."""
+        distance_matrix = self.instance_data["distance_matrix"]
+        tour = np.array(self.current_solution.tour, dtype=int)
+        tour_length = len(tour)
+        node_to_index = np.full(self.instance_data["node_num"], -1)
+        node_to_index[tour] = np.arange(tour_length)
+        current_cost = self.key_value
+        results = {}
+
+        # Append: replace the closing edge by 2 edges through the new node.
+        append_indices = [index for index, operator in enumerate(operators) if isinstance(operator, AppendOperator) and 0 <= operator.node < self.instance_data["node_num"]]
+        if append_indices:
+            nodes = np.array([operators[index].node for index in append_indices])
+            if tour_length == 0:
+                costs = distance_matrix[nodes, nodes]
+            else:
+                costs = current_cost - distance_matrix[tour[-1], tour[0]] + distance_matrix[tour[-1], nodes] + distance_matrix[nodes, tour[0]]
+            results.update(zip(append_indices, costs.tolist()))
+
+        # Swap: recompute the edges around the 2 swapped positions, counting each edge once when the positions are adjacent.
+        swap_indices = [
+            index for index, operator in enumerate(operators)
+            if isinstance(operator, SwapOperator) and len(operator.swap_node_pairs) == 1
+            and all(0 <= node < self.instance_data["node_num"] and node_to_index[node] >= 0 for node in operator.swap_node_pairs[0])
+        ]
+        if swap_indices:
+            node_pairs = np.array([operators[index].swap_node_pairs[0] for index in swap_indices])
+            positions_a, positions_b = node_to_index[node_pairs[:, 0]], node_to_index[node_pairs[:, 1]]
+            edge_starts = np.stack([positions_a - 1, positions_a, positions_b - 1, positions_b], axis=1) % tour_length
+            unique_edges = np.ones(edge_starts.shape, dtype=bool)
+            for column in range(1, edge_starts.shape[1]):
+                unique_edges[:, column] = (edge_starts[:, :column] != edge_starts[:, column:column + 1]).all(axis=1)
+            edge_ends = (edge_starts + 1) % tour_length
+            def swapped_nodes(positions: np.ndarray) -> np.ndarray:
+                nodes = tour[positions]
+                nodes = np.where(positions == positions_a[:, None], node_pairs[:, 1:2], nodes)
+                return np.where(positions == positions_b[:, None], node_pairs[:, 0:1], nodes)
+            old_costs = distance_matrix[tour[edge_starts], tour[edge_ends]]
+            new_costs = distance_matrix[swapped_nodes(edge_starts), swapped_nodes(edge_ends)]
+            costs = current_cost + ((new_costs - old_costs) * unique_edges).sum(axis=1)
+            results.update(zip(swap_indices, costs.tolist()))
+
+        # Reverse: 2-opt move that replaces the 2 boundary edges of the segment.
+        if self.symmetric_distance:
+            reverse_indices = [
+                index for index, operator in enumerate(operators)
+                if isinstance(operator, ReverseSegmentOperator) and len(operator.segments) == 1
+                and 0 <= operator.segments[0][0] <= operator.segments[0][1] < tour_length
+            ]
+            if reverse_indices:
+                segments = np.array([operators[index].segments[0] for index in reverse_indices])
+                start_indices, end_indices = segments[:, 0], segments[:, 1]
+                before_nodes, start_nodes = tour[start_indices - 1], tour[start_indices]
+                end_nodes, after_nodes = tour[end_indices], tour[(end_indices + 1) % tour_length]
+                deltas = distance_matrix[before_nodes, end_nodes] + distance_matrix[start_nodes, after_nodes] - distance_matrix[before_nodes, start_nodes] - distance_matrix[end_nodes, after_nodes]
+                # Reversing the whole tour keeps the cost.
+                deltas[end_indices - start_indices == tour_length - 1] = 0
+                costs = current_cost + deltas
+                results.update(zip(reverse_indices, costs.tolist()))
+        return results
+
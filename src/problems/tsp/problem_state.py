@@ -1,5 +1,7 @@
 # This file is generated generate_evaluation_function.py.
-from src.problems.tsp.components import Solution
+from src.problems.base.components import BaseOperator
+from src.problems.base.distance import ImplicitDistanceMatrix
+from src.problems.tsp.components import Solution, AppendOperator, SwapOperator, ReverseSegmentOperator
 
 import numpy as np
 
@@ -20,7 +22,10 @@ def get_instance_problem_state(instance_data: dict) -> dict:
     """
     distance_matrix = instance_data["distance_matrix"]
     node_num = len(distance_matrix)
-    
+
+    if isinstance(distance_matrix, ImplicitDistanceMatrix):
+        return get_implicit_instance_problem_state(distance_matrix)
+
     # Compute the average distance while ignoring the diagonal (self-loops)
     average_distance = np.sum(distance_matrix) / (node_num * (node_num - 1))
 
@@ -41,6 +46,19 @@ def get_instance_problem_state(instance_data: dict) -> dict:
         "node_num": node_num
     }
 
+def get_implicit_instance_problem_state(distance_matrix: ImplicitDistanceMatrix) -> dict:
+    """Extract the same instance problem state as the dense matrix from the statistics of the implicit distance matrix."""
+    node_num = len(distance_matrix)
+    statistics = distance_matrix.statistics()
+    mean_distance = statistics["distance_sum"] / (node_num * node_num)
+    return {
+        "average_distance": statistics["distance_sum"] / (node_num * (node_num - 1)),
+        "min_distance": statistics["min_distance"],
+        "max_distance": statistics["max_distance"],
+        "std_dev_distance": np.sqrt(max(statistics["squared_distance_sum"] / (node_num * node_num) - mean_distance ** 2, 0)),
+        "node_num": node_num
+    }
+
 def get_solution_problem_state(instance_data: dict, solution: Solution) -> dict:
     """Extract solution problem state from instance data and solution.
 
@@ -55,51 +73,91 @@ def get_solution_problem_state(instance_data: dict, solution: Solution) -> dict:
             - last_visited (int): The ID of the last visited node.
             - current_path_length (int): The number of nodes in the current path.
             - remaining_nodes (int): The number of nodes that remain unvisited.
+            - current_cost (float): The total cost of the current tour.
             - average_edge_cost (float): The average cost per edge in the current solution.
             - last_edge_cost (float): The cost of the last edge added to the current solution.
             - std_dev_edge_cost (float): The standard deviation of edge costs in the current solution.
             - min_edge_cost_remaining (float): The minimum edge cost to any unvisited node from the last visited node.
             - max_edge_cost_remaining (float): The maximum edge cost to any unvisited node from the last visited node.
     """
-    distance_matrix = instance_data["distance_matrix"]
     node_num = instance_data["node_num"]
 
     # Retrieve the tour from the solution, representing the order of nodes visited
     tour = solution.tour
 
     # Identifying nodes that have not been visited yet
-    unvisited_nodes = [node for node in range(node_num) if node not in tour]
+    visited_node_set = set(tour)
+    unvisited_nodes = [node for node in range(node_num) if node not in visited_node_set]
+
+    return get_tour_problem_state(instance_data, tour, unvisited_nodes)
+
+def update_solution_problem_state(instance_data: dict, prev_state: dict, operator: BaseOperator, new_solution: Solution) -> dict:
+    """Update solution problem state from the state before operator instead of extracting it again.
+
+    Args:
+        instance_data (dict): The dictionary contains the instance data.
+        prev_state (dict): The solution problem state before running the operator, which should not be modified.
+        operator (BaseOperator): The operator that has been run on the previous solution.
+        new_solution (Solution): The solution after running the operator.
+
+    Returns:
+        dict: The same solution problem state as get_solution_problem_state(instance_data, new_solution), or None if the operator is not supported.
+    """
+    if isinstance(operator, AppendOperator):
+        # Only the appended node leaves the unvisited nodes.
+        unvisited_nodes = [node for node in prev_state["unvisited_nodes"] if node != operator.node]
+    elif isinstance(operator, (SwapOperator, ReverseSegmentOperator)):
+        # Reordering the tour keeps the visited node set.
+        unvisited_nodes = prev_state["unvisited_nodes"]
+    else:
+        return None
+    return get_tour_problem_state(instance_data, new_solution.tour, unvisited_nodes)
+
+def get_tour_problem_state(instance_data: dict, tour: list[int], unvisited_nodes: list[int]) -> dict:
+    """Extract the solution problem state that depends on the tour edges in O(n) vectorized steps."""
+    distance_matrix = instance_data["distance_matrix"]
 
     # Identifying the last node that was visited
-    last_visited = None if not solution.tour else solution.tour[-1]
+    last_visited = None if not tour else tour[-1]
 
     # Calculate number of nodes visited and unvisited
     visited_num = len(tour)
     unvisited_num = len(unvisited_nodes)
 
-    # Get the current cost of the tour
-    current_cost = sum([instance_data["distance_matrix"][solution.tour[index]][solution.tour[index + 1]] for index in range(len(solution.tour) - 1)])
-    if len(solution.tour) > 0:
-        current_cost += instance_data["distance_matrix"][solution.tour[-1]][solution.tour[0]]
+    # Get the cost of each edge in the tour and the current cost including the edge back to start
+    edge_costs = distance_matrix[tour[:-1], tour[1:]] if len(tour) > 1 else np.zeros(0)
+    current_cost = float(np.sum(edge_costs))
+    if len(tour) > 0:
+        current_cost += distance_matrix[tour[-1], tour[0]]
 
     # Calculate average cost per visited edge
     average_edge_cost = current_cost / visited_num if visited_num > 0 else float("0")
     # Retrieve the cost of the most recent edge
     last_edge_cost = distance_matrix[last_visited, tour[0]] if tour else 0
     # Compute edge costs for standard deviation calculation
-    edge_costs = [distance_matrix[i, j] for i, j in zip(tour[:-1], tour[1:])] if len(tour) > 1 else [0]
-    std_dev_edge_cost = np.std(edge_costs) if edge_costs else 0
-    
+    std_dev_edge_cost = np.std(edge_costs) if len(edge_costs) > 0 else np.std([0])
+
     # Calculate minimum and maximum edge cost to any unvisited node from the last visited node
-    min_edge_cost_remaining = np.min([distance_matrix[last_visited, j] for j in unvisited_nodes]) if unvisited_nodes else float("0")
-    max_edge_cost_remaining = np.max([distance_matrix[last_visited, j] for j in unvisited_nodes]) if unvisited_nodes else 0
-    
+    if unvisited_nodes and last_visited is None and isinstance(distance_matrix, ImplicitDistanceMatrix):
+        # Without last visited node, all nodes are unvisited and the remaining edges are the whole matrix, whose minimum is the zero diagonal.
+        min_edge_cost_remaining = 0.0
+        max_edge_cost_remaining = distance_matrix.statistics()["max_distance"]
+    elif unvisited_nodes:
+        remaining_edge_costs = distance_matrix[last_visited, unvisited_nodes] if last_visited is not None else distance_matrix[unvisited_nodes]
+        min_edge_cost_remaining = np.min(remaining_edge_costs)
+        max_edge_cost_remaining = np.max(remaining_edge_costs)
+    else:
+        min_edge_cost_remaining = float("0")
+        max_edge_cost_remaining = 0
+
     return {
-        "visited_nodes": tour,
+        # Copy the tour, as operators may modify the solution in place while heuristics hold earlier states.
+        "visited_nodes": list(tour),
         "unvisited_nodes": unvisited_nodes,
         "last_visited": last_visited,
         "visited_num": visited_num,
         "unvisited_num": unvisited_num,
+        "current_cost": current_cost,
         "average_edge_cost": average_edge_cost,
         "last_edge_cost": last_edge_cost,
         "std_dev_edge_cost": std_dev_edge_cost,
@@ -0,0 +1,74 @@
+import os
+import threading
+
+
+class FileIndex:
+    """Index from file and directory names to their first path in the os.walk order of a folder.
+
+    The index is built by one walk and answers lookups with a dict access.
+    It records the mtime of the folder, which changes when an entry is added, removed or renamed at its top level.
+    A hit is returned while the path still exists, and a miss or a removed path rebuilds the index once the folder has changed or refresh is called, so a miss costs one stat.
+    Files added in subdirectories are found after refresh, which writers of generated files call through refresh_file_indexes.
+    """
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self.build()
+
+    def build(self) -> None:
+        paths: dict[str, str] = {}
+        folder_mtime = self.get_mtime(self.folder_path)
+        for root, dirs, files in os.walk(self.folder_path):
+            # Keep the first root in walk order for each name, as searching the walk does.
+            for name in files + dirs:
+                paths.setdefault(name, os.path.join(root, name))
+        self.paths = paths
+        self.folder_mtime = folder_mtime
+        self.refreshed = False
+
+    def get_mtime(self, directory: str) -> int:
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self) -> None:
+        """Rebuild the index on the next miss, such as after a file is written in a subdirectory."""
+        self.refreshed = True
+
+    @property
+    def is_stale(self) -> bool:
+        return self.refreshed or self.get_mtime(self.folder_path) != self.folder_mtime
+
+    def find(self, name: str) -> str:
+        path = self.paths.get(name)
+        if path is not None and os.path.exists(path):
+            return path
+        if self.is_stale:
+            self.build()
+            return self.paths.get(name)
+        return None
+
+
+# File indexes of this process, keyed by the absolute and the given folder path, as the found paths are joined to the given one.
+file_indexes: dict[tuple[str, str], FileIndex] = {}
+file_indexes_lock = threading.Lock()
+
+
+def find_file_in_folder(folder_path: str, file_name: str) -> str:
+    """Find the first file or directory named file_name under folder_path in os.walk order through the index of the folder."""
+    key = (os.path.abspath(folder_path), folder_path)
+    with file_indexes_lock:
+        file_index = file_indexes.get(key)
+        if file_index is None:
+            file_index = FileIndex(folder_path)
+            file_indexes[key] = file_index
+        return file_index.find(file_name)
+
+
+def refresh_file_indexes(file_path: str) -> None:
+    """Refresh the indexes of the folders that contain file_path, so a file written there is found on the next lookup."""
+    file_path = os.path.abspath(file_path)
+    with file_indexes_lock:
+        for (folder_path, _), file_index in file_indexes.items():
+            if file_path.startswith(os.path.join(folder_path, "")):
+                file_index.refresh()
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class HeuristicRidgeModel:
+    """Online ridge regression of one heuristic, which keeps the sufficient statistics X^T X and X^T y, so an update costs O(d^2) and a fit solves one d x d system."""
+    def __init__(self, feature_num: int, regularization: float):
+        self.regularization = regularization
+        self.xtx = np.zeros((feature_num + 1, feature_num + 1))
+        self.xty = np.zeros(feature_num + 1)
+        self.sample_num = 0
+        # Squared errors of predictions made before each sample is learned, which estimate the error on unseen states.
+        self.squared_error_sum = 0.0
+        self.error_num = 0
+        self.weights: np.ndarray = None
+
+    def predict(self, features: np.ndarray) -> float:
+        if self.weights is None:
+            # Scale the penalty with the features, so it only stabilizes the solve whatever the magnitude of the observations.
+            penalty = self.regularization * max(np.trace(self.xtx) / len(self.xtx), 1e-12)
+            self.weights = np.linalg.solve(self.xtx + penalty * np.eye(len(self.xtx)), self.xty)
+        return float(features @ self.weights)
+
+    def update(self, features: np.ndarray, target: float, measure_error: bool=True) -> None:
+        if measure_error and self.sample_num > 0:
+            self.squared_error_sum += (self.predict(features) - target) ** 2
+            self.error_num += 1
+        self.xtx += np.outer(features, features)
+        self.xty += features * target
+        self.sample_num += 1
+        self.weights = None
+
+    @property
+    def variance(self) -> float:
+        return self.squared_error_sum / self.error_num if self.error_num > 0 else None
+
+
+class RolloutSurrogate:
+    """Online surrogate of rollout outcomes, which predicts the change of key value that the rollouts of a heuristic reach from the current observation.
+
+    Each heuristic has its own ridge regression on the numeric observation values and the current key value, so the predicted ranking of candidates changes with the state.
+    Models are keyed by the heuristic and the names of the numeric observation values, so observations with other keys train and query their own models instead of misaligned features.
+    It learns from the average key value of the rollouts that tts_bon runs, and is queried before the rollouts of the next selection.
+    A heuristic is trusted once its errors are measured on min_errors samples after its first min_samples ones, each predicted before it is learned.
+    A pruned heuristic still gets rollouts every exploration_interval times it is pruned, so the surrogate keeps learning it and can correct a wrong prediction.
+    All models are small numpy systems, so learning and prediction take microseconds per heuristic.
+    """
+    def __init__(self, min_samples: int=5, min_errors: int=10, exploration_interval: int=4, regularization: float=1e-3):
+        self.min_samples = min_samples
+        self.min_errors = min_errors
+        self.exploration_interval = exploration_interval
+        self.regularization = regularization
+        self.models: dict[tuple[str, tuple[str, ...]], HeuristicRidgeModel] = {}
+        self.pruned_nums: dict[str, int] = {}
+
+    def get_features(self, observation: dict, key_value: float) -> tuple[tuple[str, ...], np.ndarray]:
+        """Get the names of the numeric observation values, which key the models, and the feature vector of the values, the key value and the bias."""
+        feature_names = tuple(sorted(
+            key for key, value in observation.items()
+            if isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+        ))
+        values = [float(observation[name]) for name in feature_names]
+        return feature_names, np.array(values + [float(key_value), 1.0])
+
+    def update(self, heuristic: str, observation: dict, key_value: float, rollout_key_value: float) -> None:
+        """Learn that the rollouts of heuristic from the observation with key_value reach rollout_key_value on average."""
+        feature_names, features = self.get_features(observation, key_value)
+        model_key = (heuristic, feature_names)
+        if model_key not in self.models:
+            self.models[model_key] = HeuristicRidgeModel(len(features) - 1, self.regularization)
+        model = self.models[model_key]
+        # Errors of the first fits on a few samples are far larger than later ones, so errors are measured once the model has min_samples samples.
+        model.update(features, rollout_key_value - key_value, measure_error=model.sample_num >= self.min_samples)
+
+    def predict(self, heuristic: str, observation: dict, key_value: float) -> tuple[float, float]:
+        """Predicted average rollout key value of heuristic and the variance of its error, or (None, None) before the heuristic is trusted for the observation keys."""
+        feature_names, features = self.get_features(observation, key_value)
+        model = self.models.get((heuristic, feature_names))
+        if model is None or model.error_num < self.min_errors:
+            return None, None
+        return key_value + model.predict(features), model.variance
+
+    def prune(self, compare: callable, candidate_heuristics: list[str], observation: dict, key_value: float, confidence_z: float=1.96) -> list[str]:
+        """Drop the candidates that the surrogate predicts worse than the best predicted one beyond the confidence interval of their errors.
+        Candidates without trusted predictions are kept, every exploration_interval-th prune of a candidate keeps it, and the candidate order is kept."""
+        predictions = {heuristic: self.predict(heuristic, observation, key_value) for heuristic in candidate_heuristics}
+        predicted_heuristics = [heuristic for heuristic in candidate_heuristics if predictions[heuristic][0] is not None]
+        if len(predicted_heuristics) < 2:
+            return list(candidate_heuristics)
+        leader = predicted_heuristics[0]
+        for heuristic in predicted_heuristics[1:]:
+            if compare(predictions[heuristic][0], predictions[leader][0]) > 0:
+                leader = heuristic
+        leader_prediction, leader_variance = predictions[leader]
+        kept_heuristics = []
+        for heuristic in candidate_heuristics:
+            if heuristic != leader and predictions[heuristic][0] is not None \
+                    and compare(leader_prediction, predictions[heuristic][0]) > confidence_z * (leader_variance + predictions[heuristic][1]) ** 0.5:
+                self.pruned_nums[heuristic] = self.pruned_nums.get(heuristic, 0) + 1
+                if self.pruned_nums[heuristic] % self.exploration_interval != 0:
+                    continue
+            kept_heuristics.append(heuristic)
+        return kept_heuristics
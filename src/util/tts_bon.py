@@ -1,67 +1,260 @@
-import concurrent
+import os
+import time
+import random
+import functools
+import concurrent.futures
 import dill
-import multiprocessing
-import multiprocessing.managers
+import numpy as np
 from src.pipeline.hyper_heuristics.random import RandomHyperHeuristic
+from src.problems.base.budget import Budget
+from src.problems.base.components import BaseSolution
 from src.problems.base.env import BaseEnv
+from src.problems.base.recorder import TrajectoryRecorder
+from src.util.rollout_surrogate import RolloutSurrogate
 from src.util.util import load_function
 
 dill.settings['recurse'] = True
 
-def run_random_hh(
-        env_serialized: bytes,
+# Env and compiled heuristics of this worker process, which are loaded once by init_rollout_worker.
+rollout_worker: dict = {}
+
+def init_rollout_worker(env_serialized: bytes, heuristic_pool: list[str], problem: str) -> None:
+    env = dill.loads(env_serialized)
+    # Runs in workers start from an empty recorder and write no files, as the parent writes the results it keeps.
+    env.recordings = TrajectoryRecorder(compare=env.compare, **env.recording_config)
+    env.output_dir = None
+    rollout_worker["env"] = env
+    rollout_worker["heuristics"] = {heuristic: load_function(heuristic, problem) for heuristic in heuristic_pool}
+
+def get_rollout_heuristic(heuristic_name: str, problem: str) -> callable:
+    heuristic = rollout_worker.get("heuristics", {}).get(heuristic_name)
+    return heuristic if heuristic is not None else load_function(heuristic_name, problem)
+
+def dump_env_state(env: BaseEnv) -> bytes:
+    """Serialize the solution snapshot of env with its step counters, which is restored on the warm env of a worker instead of shipping the whole env.
+    Recordings are not sent, and solution problem states are recomputed by the worker."""
+    snapshot = env.snapshot()
+    snapshot["solution_problem_state"] = None
+    snapshot["solution_problem_state_update"] = None
+    return dill.dumps(snapshot)
+
+def load_env_state(env_state: bytes, deadline: float=None) -> BaseEnv:
+    env = rollout_worker["env"].fork()
+    env.restore(dill.loads(env_state))
+    # Runs in workers stop at the wall-clock deadline of the run, as incomplete solutions.
+    if deadline is not None:
+        env.budget = Budget(time_limit=deadline - time.time(), keep_best_solution=False)
+    return env
+
+def is_expired(deadline: float) -> bool:
+    return deadline is not None and time.time() >= deadline
+
+def iter_completed(futures: dict, deadline: float=None):
+    """Yield the futures as they complete until the deadline, and cancel the ones not started when the iteration stops."""
+    try:
+        yield from concurrent.futures.as_completed(futures, timeout=None if deadline is None else max(0, deadline - time.time()))
+    except concurrent.futures.TimeoutError:
+        pass
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class RolloutCache:
+    """Rollout results of candidates from solutions seen before, which are reused across selection rounds and tts_bon calls.
+
+    Entries are keyed by (solution hash, heuristic name, steps_per_selection, iterations_scale_factor, rollout_horizon, completion_heuristic) and hold the key value of each rollout by its index, with None for incomplete ones.
+    Solutions with the same canonical hash, such as the unchanged solution after a heuristic returns None, share their entries.
+    The oldest entries are dropped beyond max_entries.
+    """
+    def __init__(self, max_entries: int=100000):
+        self.max_entries = max_entries
+        self.entries: dict[tuple, list[float]] = {}
+
+    def get(self, key: tuple) -> list[float]:
+        return list(self.entries.get(key, []))
+
+    def put(self, key: tuple, results: list[float]) -> None:
+        self.entries.pop(key, None)
+        self.entries[key] = list(results)
+        if len(self.entries) > self.max_entries:
+            self.entries.pop(next(iter(self.entries)))
+
+
+class RolloutPool:
+    """Long-lived process pool for tts_bon, whose workers load the env and compile the heuristics once.
+
+    The instance arrays of env are placed in shared memory before the workers start, so every worker attaches the same instance data.
+    Each selection round then ships only the current solution state to the warm workers.
+    The pool serves one instance, so it also keeps the rollout cache of the instance.
+    """
+    def __init__(self, env: BaseEnv, heuristic_pool: list[str], problem: str, max_workers: int=None):
+        self.problem = problem
+        self.rollout_cache = RolloutCache()
+        env.share_instance_data()
+        self.max_workers = max_workers
+        self.initargs = (dill.dumps(env), heuristic_pool, problem)
+        self.executor = self.create_executor()
+
+    def create_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_rollout_worker, initargs=self.initargs)
+
+    def restart(self) -> None:
+        """Replace a broken executor, such as one whose worker was killed by OOM, by new workers. The rollout cache is kept."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = self.create_executor()
+
+    def submit(self, function: callable, *args) -> concurrent.futures.Future:
+        return self.executor.submit(function, *args)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "RolloutPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+
+def run_heuristic_steps(env_state: bytes, heuristic_name: str, problem: str, steps: int, deadline: float=None) -> bytes:
+    """Run the candidate heuristic for steps on the env state and return the new env state, which the rollouts of the candidate start from."""
+    env = load_env_state(env_state, deadline)
+    heuristic = get_rollout_heuristic(heuristic_name, problem)
+    for _ in range(steps):
+        env.run_heuristic(heuristic)
+    return dump_env_state(env)
+
+def get_rollout_seed(solution_hash: int, rollout_index: int) -> int:
+    """Seed of rollout rollout_index from the solution, which is the same for every candidate, so their rollouts with one index use common random numbers."""
+    return hash((solution_hash, rollout_index)) & 0xFFFFFFFF
+
+def run_rollout(
+        env_state: bytes,
         heuristic_pool: list[str],
         problem: str,
         iterations_scale_factor: float,
-        best_result_proxy: multiprocessing.managers.ValueProxy,
-) -> float:
-    random_hh = RandomHyperHeuristic(heuristic_pool, problem, iterations_scale_factor)
-    env = dill.loads(env_serialized)
-    complete_and_valid_solution = random_hh.run(env)
-
-    if complete_and_valid_solution:
-        # If found best, save it
-        if best_result_proxy.value == float('-inf') or env.compare(env.key_value, best_result_proxy.value) >= 0:
-            best_result_proxy.value = env.key_value
-            env.dump_result(result_file=f"best_result_{env.key_value}.txt")
-        return env.key_value
+        seed: int,
+        rollout_horizon: int=None,
+        completion_heuristic: str=None,
+        deadline: float=None,
+) -> tuple[float, BaseSolution]:
+    """Complete the env state by random hyper-heuristic with the heuristic sequence of seed. Return the key value and complete solution, or (None, None) for incomplete or invalid solution.
+
+    With rollout_horizon, the random hyper-heuristic stops after rollout_horizon steps, so the cost of a rollout does not grow with the instance.
+    The partial solution is then completed by running completion_heuristic until the solution is complete, or scored by env.estimate_key_value without completion_heuristic.
+    Estimated rollouts return no solution, as they have no complete solution to save.
+    Problems without estimate continue the random hyper-heuristic for the remaining steps.
+    Rollouts still running at the deadline stop there and return (None, None).
+    """
+    env = load_env_state(env_state, deadline)
+    # Heuristics that draw random numbers also get the same stream in the rollouts with one seed.
+    random.seed(seed)
+    np.random.seed(seed)
+    random_hh = RandomHyperHeuristic([get_rollout_heuristic(heuristic, problem) for heuristic in heuristic_pool], problem, iterations_scale_factor, seed)
+    max_steps = int(env.construction_steps * iterations_scale_factor)
+    if rollout_horizon is None or rollout_horizon > max_steps:
+        random_hh.run(env)
     else:
-        return None
+        # run counts steps up to max_steps inclusively, so the horizon of n steps is max_steps n - 1.
+        random_hh.run(env, max_steps=rollout_horizon - 1)
+        if not env.is_complete_solution:
+            if completion_heuristic is not None:
+                heuristic = get_rollout_heuristic(completion_heuristic, problem)
+                for _ in range(max_steps - rollout_horizon + 1):
+                    if env.is_complete_solution or not env.continue_run or env.run_heuristic(heuristic) is None:
+                        break
+            else:
+                key_value = env.estimate_key_value()
+                if key_value is not None:
+                    return key_value, None
+                random_hh.run(env, max_steps=max_steps - rollout_horizon)
+    if not env.is_complete_solution or not env.is_valid_solution:
+        return None, None
+    return env.key_value, env.current_solution
 
-def evaluate_heuristic(
-        env_serialized: bytes,
-        heuristic_name: str,
+def submit_rollouts(
+        rollout_pool: RolloutPool,
+        candidate_state: bytes,
+        heuristic: str,
+        results: list[float],
+        rollout_num: int,
+        solution_hash: int,
         heuristic_pool: list[str],
         problem: str,
         iterations_scale_factor: float,
-        steps_per_selection: int,
-        rollout_budget: int,
-        best_result_proxy: multiprocessing.managers.ValueProxy,
-) -> tuple[float, str, bytes]:
-    env = dill.loads(env_serialized)
-    heuristic = load_function(heuristic_name, problem)
-    operators = []
-    for _ in range(steps_per_selection):
-        operators.append(env.run_heuristic(heuristic))
-    after_step_env_serialized = dill.dumps(env)
-    # MCTS to evaluate heuristic performance
-    results = []
-    future_results = []
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        for _ in range(rollout_budget):
-            future_results.append(executor.submit(
-                run_random_hh,
-                after_step_env_serialized,
-                heuristic_pool,
-                problem,
-                iterations_scale_factor,
-                best_result_proxy,
-                ))
-    for future in concurrent.futures.as_completed(future_results):
-        result = future.result()
-        if result:
-            results.append(result)
-    return heuristic_name, results
+        rollout_horizon: int=None,
+        completion_heuristic: str=None,
+        deadline: float=None,
+) -> dict:
+    """Submit the rollouts of the candidate from the next index of its results up to rollout_num, and reserve their places in results."""
+    rollout_futures = {
+        rollout_pool.submit(
+            run_rollout, candidate_state, heuristic_pool, problem, iterations_scale_factor,
+            get_rollout_seed(solution_hash, rollout_index), rollout_horizon, completion_heuristic, deadline,
+        ): (heuristic, rollout_index)
+        for rollout_index in range(len(results), rollout_num)
+    }
+    results.extend([None] * (rollout_num - len(results)))
+    return rollout_futures
+
+def collect_rollouts(env: BaseEnv, rollout_futures: dict, results: dict[str, list[float]], best_key_value: float, deadline: float=None) -> float:
+    """Store the key value of each finished rollout at its index in the results of its candidate, and return the best key value so far.
+    The best rollout is tracked here and saved on each improvement, instead of sharing the best value with the workers.
+    Its result is written from the returned solution and key value, without trajectory as in the best result of ResultWriter.
+    Rollouts not finished by the deadline are left as None."""
+    for future in iter_completed(rollout_futures, deadline):
+        key_value, solution = future.result()
+        if key_value is None:
+            continue
+        heuristic, rollout_index = rollout_futures[future]
+        results[heuristic][rollout_index] = key_value
+        # Estimated key values of truncated rollouts have no solution to save.
+        if solution is None:
+            continue
+        if best_key_value is None or env.compare(key_value, best_key_value) >= 0:
+            best_key_value = key_value
+            if env.output_dir is not None:
+                with open(os.path.join(env.output_dir, f"best_result_{key_value}.txt"), "w") as file:
+                    file.write(
+                        f"-data: {env.data_path}\n-current_solution:\n{solution}\n"
+                        f"-is_complete_solution: True\n-is_valid_solution: True\n-{env.key_item}: {key_value}\n"
+                    )
+    return best_key_value
+
+def get_paired_results(results_list: list[list[float]]) -> list[list[float]]:
+    """Key values of the rollout indices that are complete in all results, which share their random numbers and are compared pairwise."""
+    paired_indices = [
+        rollout_index for rollout_index in range(min(len(results) for results in results_list))
+        if all(results[rollout_index] is not None for results in results_list)
+    ]
+    return [[results[rollout_index] for rollout_index in paired_indices] for results in results_list]
+
+def rank_candidates(env: BaseEnv, candidate_heuristics: list[str], results: dict[str, list[float]]) -> list[str]:
+    """Sort candidates from the best average key value to the worst. Candidates without complete rollouts are the last, and ties keep the candidate order.
+    Averages are taken over the rollout indices complete for all ranked candidates, so the order follows their paired differences. Without such indices, each candidate uses all its complete rollouts."""
+    scored_heuristics = [heuristic for heuristic in candidate_heuristics if any(key_value is not None for key_value in results[heuristic])]
+    if len(scored_heuristics) == 0:
+        return list(candidate_heuristics)
+    paired_results = dict(zip(scored_heuristics, get_paired_results([results[heuristic] for heuristic in scored_heuristics])))
+    if len(paired_results[scored_heuristics[0]]) == 0:
+        paired_results = {heuristic: [key_value for key_value in results[heuristic] if key_value is not None] for heuristic in scored_heuristics}
+    averages = {heuristic: sum(paired_results[heuristic]) / len(paired_results[heuristic]) for heuristic in scored_heuristics}
+    # compare returns a positive value when the first is better, and sorted is stable, so ties keep the candidate order.
+    ranked_heuristics = sorted(scored_heuristics, key=functools.cmp_to_key(lambda first, second: -env.compare(averages[first], averages[second])))
+    return ranked_heuristics + [heuristic for heuristic in candidate_heuristics if heuristic not in averages]
+
+def is_dominated(env: BaseEnv, leader_results: list[float], results: list[float], confidence_z: float) -> bool:
+    """Whether the candidate is worse than the leader beyond the confidence interval of their paired differences.
+    Rollouts with one index share their random numbers, so the differences cancel the noise of the random heuristic sequence."""
+    if all(key_value is None for key_value in results):
+        return any(key_value is not None for key_value in leader_results)
+    paired_leader_results, paired_results = get_paired_results([leader_results, results])
+    if len(paired_results) < 2:
+        return False
+    advantages = [env.compare(leader_key_value, key_value) for leader_key_value, key_value in zip(paired_leader_results, paired_results)]
+    mean = sum(advantages) / len(advantages)
+    squared_standard_error = sum((advantage - mean) ** 2 for advantage in advantages) / (len(advantages) - 1) / len(advantages)
+    return mean > confidence_z * squared_standard_error ** 0.5
 
 def tts_bon(
         env: BaseEnv,
@@ -71,34 +264,98 @@ def tts_bon(
         iterations_scale_factor: float,
         steps_per_selection: int,
         rollout_budget: int,
-) -> tuple[str, bytes]:
-    if rollout_budget == 0 or len(candidate_heuristics) == 1:
+        rollout_pool: RolloutPool=None,
+        racing: bool=False,
+        racing_initial_rollouts: int=2,
+        confidence_z: float=1.96,
+        rollout_horizon: int=None,
+        completion_heuristic: str=None,
+        surrogate: RolloutSurrogate=None,
+        observation: dict=None,
+        deadline: float=None,
+) -> str:
+    """Select the candidate heuristic with the best average key value of rollouts, which run the candidate for steps_per_selection and complete the solution by random hyper-heuristic.
+
+    Without racing, every candidate gets rollout_budget rollouts.
+    With racing, each round runs rollouts for the surviving candidates and drops the candidates that are worse than the leader beyond the confidence interval.
+    The first round runs racing_initial_rollouts rollouts per candidate, and each later round doubles the rollouts of the survivors, up to rollout_budget per candidate.
+    Candidates that the confidence interval does not separate from the leader keep running, so racing only saves the rollouts of clearly worse candidates.
+    Rollouts cached in the pool for the same solution and candidate count towards the budget, so repeated selections from one solution only run the missing rollouts.
+    With rollout_horizon, rollouts are truncated after rollout_horizon steps and scored by completion_heuristic or the estimate of env, as in run_rollout.
+    Rollout i of every candidate is seeded from the solution and i, so candidates are compared on common random numbers by their paired differences.
+    With surrogate and the observation of env, candidates that the surrogate predicts worse than the best one beyond its confidence interval get no rollouts, and the surrogate learns the rollout outcomes of the others.
+    deadline is the wall-clock time.time() of the end of the run, such as env.budget.deadline. No rollouts are submitted or awaited after it, and the best candidate on the rollouts finished by then is selected.
+    """
+    if rollout_budget == 0 or len(candidate_heuristics) == 1 or is_expired(deadline):
         return candidate_heuristics[0]
-    manager = multiprocessing.Manager()
-    best_result_proxy = manager.Value('d', float('-inf'))
-    env_serialized = dill.dumps(env)
-    futures = []
-    for heuristic in candidate_heuristics:
-        with concurrent.futures.ProcessPoolExecutor() as executor:
-            futures.append(executor.submit(
-                evaluate_heuristic,
-                env_serialized,
-                heuristic,
-                heuristic_pool,
-                problem,
-                iterations_scale_factor,
-                steps_per_selection,
-                rollout_budget,
-                best_result_proxy
-            ))
-
-    best_average_score = None
-    for future in concurrent.futures.as_completed(futures):
-        heuristic_name, results  = future.result()
-        average_score = None if len(results) <= 0 else sum(results) / len(results)
-        best_heuristic_name = candidate_heuristics[0]
-        if average_score is not None:
-            if best_average_score is None or env.compare(average_score, best_average_score) > 0:
-                best_heuristic_name = heuristic_name
-                best_average_score = average_score
-    return best_heuristic_name
\ No newline at end of file
+    if surrogate is not None and observation is not None:
+        candidate_heuristics = surrogate.prune(env.compare, candidate_heuristics, observation, env.key_value, confidence_z)
+        if len(candidate_heuristics) == 1:
+            return candidate_heuristics[0]
+    # Without a pool from the caller, a pool lives for this selection only.
+    if rollout_pool is None:
+        with RolloutPool(env, heuristic_pool, problem) as rollout_pool:
+            return tts_bon(env, candidate_heuristics, heuristic_pool, problem, iterations_scale_factor, steps_per_selection, rollout_budget, rollout_pool, racing, racing_initial_rollouts, confidence_z, rollout_horizon, completion_heuristic, surrogate, observation, deadline)
+
+    # Start from the rollouts cached for the same solution and candidate, and run only the missing ones.
+    # Results hold one entry per rollout run, with None for incomplete solutions, so the index of each rollout keeps its seed.
+    solution_hash = env.current_solution.canonical_hash()
+    cache_keys = {heuristic: (solution_hash, heuristic, steps_per_selection, iterations_scale_factor, rollout_horizon, completion_heuristic) for heuristic in candidate_heuristics}
+    results = {heuristic: rollout_pool.rollout_cache.get(cache_keys[heuristic]) for heuristic in candidate_heuristics}
+    # Rounds cut by the deadline have rollouts stopped as incomplete, so their results are neither cached nor learned.
+    def update_cache() -> None:
+        if is_expired(deadline):
+            return
+        for heuristic in candidate_heuristics:
+            rollout_pool.rollout_cache.put(cache_keys[heuristic], results[heuristic])
+    # Only rollouts run by this call are learned, so cached results are not learned again on repeated selections from one solution.
+    cached_rollout_nums = {heuristic: len(results[heuristic]) for heuristic in candidate_heuristics}
+    def update_surrogate() -> None:
+        if surrogate is None or observation is None or is_expired(deadline):
+            return
+        for heuristic in candidate_heuristics:
+            key_values = [key_value for key_value in results[heuristic] if key_value is not None]
+            if len(results[heuristic]) > cached_rollout_nums[heuristic] and len(key_values) > 0:
+                surrogate.update(heuristic, observation, env.key_value, sum(key_values) / len(key_values))
+
+    # Run the steps of the candidates that need more rollouts at the same time.
+    env_state = dump_env_state(env)
+    step_futures = {
+        rollout_pool.submit(run_heuristic_steps, env_state, heuristic, problem, steps_per_selection, deadline): heuristic
+        for heuristic in candidate_heuristics if len(results[heuristic]) < rollout_budget
+    }
+    best_key_value = None
+
+    if not racing:
+        # Submit the rollouts of each candidate as soon as its steps finish.
+        # Every rollout is an independent task, so the candidate x rollout jobs of the round spread over all workers.
+        rollout_futures = {}
+        for future in iter_completed(step_futures, deadline):
+            heuristic = step_futures[future]
+            rollout_futures.update(submit_rollouts(rollout_pool, future.result(), heuristic, results[heuristic], rollout_budget, solution_hash, heuristic_pool, problem, iterations_scale_factor, rollout_horizon, completion_heuristic, deadline))
+        collect_rollouts(env, rollout_futures, results, best_key_value, deadline)
+        update_cache()
+        update_surrogate()
+        return rank_candidates(env, candidate_heuristics, results)[0]
+
+    candidate_states = {step_futures[future]: future.result() for future in iter_completed(step_futures, deadline)}
+    surviving_heuristics = list(candidate_heuristics)
+    rollout_num = min(racing_initial_rollouts, rollout_budget)
+    while True:
+        # The deadline is checked between rounds, and the leader on the finished rollouts is selected once it passes.
+        if is_expired(deadline):
+            return rank_candidates(env, surviving_heuristics, results)[0]
+        rollout_futures = {}
+        for heuristic in surviving_heuristics:
+            if len(results[heuristic]) < rollout_num:
+                rollout_futures.update(submit_rollouts(rollout_pool, candidate_states[heuristic], heuristic, results[heuristic], rollout_num, solution_hash, heuristic_pool, problem, iterations_scale_factor, rollout_horizon, completion_heuristic, deadline))
+        best_key_value = collect_rollouts(env, rollout_futures, results, best_key_value, deadline)
+        update_cache()
+        ranked_heuristics = rank_candidates(env, surviving_heuristics, results)
+        leader = ranked_heuristics[0]
+        surviving_heuristics = [leader] + [heuristic for heuristic in ranked_heuristics[1:] if not is_dominated(env, results[leader], results[heuristic], confidence_z)]
+        if len(surviving_heuristics) == 1 or rollout_num >= rollout_budget:
+            update_surrogate()
+            return surviving_heuristics[0]
+        # Survivors get twice the rollouts, still at most rollout_budget each. Rollouts not run for dropped candidates are saved, not given to the survivors.
+        rollout_num = min(rollout_num * 2, rollout_budget)
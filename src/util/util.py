@@ -6,6 +6,7 @@ import hashlib
 import numpy as np
 import pandas as pd
 import difflib
+from src.util.file_index import find_file_in_folder
 
 
 def extract(message: str, key: str, sep=None) -> list[str]:
@@ -197,9 +198,6 @@ def replace_strings_in_dict(source_dict: dict, replace_value: str="...") -> dict
     return source_dict
 
 def search_file(file_name: str, problem: str="base") -> str:
-    def find_file_in_folder(folder_path, file_name):
-        return next((os.path.join(root, file_name) for root, dirs, files in os.walk(folder_path) if file_name in files or file_name in dirs), None)
-
     if os.path.exists(file_name):
         return file_name
 